@@ -0,0 +1,478 @@
+#Author: Remi Pelletier
+#File:   bench.py
+#Desc.:  Benchmark harness comparing the algorithms of the package on
+#        reproducible (seeded) inputs, emitting JSON or CSV records.
+#        Usage: python -m sneklib.bench {sorting,heaps,search} [options]
+
+import argparse
+import bisect
+import csv
+import heapq
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import time
+
+#The modules of the package import each other by their plain names.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import array_search
+import data_structures
+import sorting
+import trees
+
+
+DEFAULT_SIZES = [10, 100, 1000, 10**4, 10**5, 10**6, 10**7]
+DEFAULT_REPEAT = 5
+DEFAULT_WARMUP = 1
+DEFAULT_SEED = 42
+QUADRATIC_CAP = 2000 #Size past which the quadratic algorithms are skipped.
+RECURSIVE_CAP = 500 #Size past which the algorithms recursing once per element are skipped (recursion limit).
+INSTRUMENT_CAP = 10**5 #Size past which comparisons and writes are not counted.
+EXTERNAL_SORT_MEMORY = 1024 * 1024 #Memory budget making external_sort() spill runs.
+DEFAULT_QUERIES = 10**5 #Number of lookups timed by the search benchmarks.
+
+
+#---------------------------------Instrumentation-------------------------------
+
+#Wraps a value to count the comparisons made between wrapped values.
+class _Counted:
+    __slots__ = ('value',)
+    comparisons = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __eq__(self, other):
+        _Counted.comparisons += 1
+        return self.value == other.value
+
+    def __ne__(self, other):
+        _Counted.comparisons += 1
+        return self.value != other.value
+
+    def __lt__(self, other):
+        _Counted.comparisons += 1
+        return self.value < other.value
+
+    def __le__(self, other):
+        _Counted.comparisons += 1
+        return self.value <= other.value
+
+    def __gt__(self, other):
+        _Counted.comparisons += 1
+        return self.value > other.value
+
+    def __ge__(self, other):
+        _Counted.comparisons += 1
+        return self.value >= other.value
+
+
+#List counting the elements written into it (a swap counts as two writes).
+class _CountingList(list):
+    writes = 0
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = list(value)
+            _CountingList.writes += len(value)
+        else:
+            _CountingList.writes += 1
+        super().__setitem__(index, value)
+
+
+#Runs the function on an instrumented copy of the data and
+#returns the number of comparisons (None if not counted) and writes.
+def _instrument(function, data, count_comparisons):
+    _Counted.comparisons = 0
+    _CountingList.writes = 0
+    lst = _CountingList(_Counted(val) for val in data) if count_comparisons else _CountingList(data)
+    function(lst)
+    return (_Counted.comparisons if count_comparisons else None), _CountingList.writes
+
+
+#Times the function on fresh copies of the data and returns the list of durations
+#(in seconds) of the repetitions, the warmup runs being discarded.
+def _time_runs(function, data, repeat, warmup):
+    durations = []
+    for i in range(warmup + repeat):
+        lst = list(data)
+        start = time.perf_counter()
+        function(lst)
+        duration = time.perf_counter() - start
+        if i >= warmup:
+            durations.append(duration)
+    return durations
+
+
+#Returns the timing statistics of the given durations.
+def _summarize(durations):
+    return {'best': min(durations),
+            'mean': statistics.mean(durations),
+            'median': statistics.median(durations)}
+
+
+#--------------------------------Distributions---------------------------------
+
+#Each generator returns a list of n values using the given random generator.
+
+def _random_ints(rng, n):
+    return [rng.randrange(n) for _ in range(n)]
+
+def _sorted_ints(rng, n):
+    return sorted(_random_ints(rng, n))
+
+def _reversed_ints(rng, n):
+    return sorted(_random_ints(rng, n), reverse=True)
+
+def _organ_pipe_ints(rng, n):
+    half = sorted(_random_ints(rng, (n + 1) // 2))
+    return half + half[::-1][n % 2:]
+
+def _few_unique_ints(rng, n):
+    return [rng.randrange(8) for _ in range(n)]
+
+def _nearly_sorted_ints(rng, n):
+    lst = _sorted_ints(rng, n)
+    for _ in range(max(n // 100, 1)):
+        i, j = rng.randrange(n), rng.randrange(n)
+        lst[i], lst[j] = lst[j], lst[i]
+    return lst
+
+def _wide_range_ints(rng, n):
+    return [rng.randint(-2**62, 2**62) for _ in range(n)]
+
+def _strings(rng, n):
+    return [''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(8, 16))) for _ in range(n)]
+
+
+#Name -> (generator, kind of values: 'int' for integers within [0, n), 'wide-int' or 'str').
+DISTRIBUTIONS = {
+    'random':        (_random_ints,        'int'),
+    'sorted':        (_sorted_ints,        'int'),
+    'reversed':      (_reversed_ints,      'int'),
+    'organ-pipe':    (_organ_pipe_ints,    'int'),
+    'few-unique':    (_few_unique_ints,    'int'),
+    'nearly-sorted': (_nearly_sorted_ints, 'int'),
+    'wide-range':    (_wide_range_ints,    'wide-int'),
+    'strings':       (_strings,            'str'),
+}
+
+
+#Returns the list generated by the given distribution, seeded
+#by the seed, the distribution's name and the size.
+def generate(distribution, n, seed = DEFAULT_SEED):
+    rng = random.Random('%s-%s-%d' % (seed, distribution, n))
+    return DISTRIBUTIONS[distribution][0](rng, n)
+
+
+#------------------------------Sorting benchmarks------------------------------
+
+def _external_sort(lst):
+    lst[:] = sorting.external_sort(list(lst), memory_budget=EXTERNAL_SORT_MEMORY)
+
+
+#Name -> (function, kinds of values accepted, quadratic, counts comparisons).
+SORTING_ALGORITHMS = {
+    'selection_sort':       (sorting.selection_sort,       ('int', 'wide-int', 'str'), True,  True),
+    'bubble_sort':          (sorting.bubble_sort,          ('int', 'wide-int', 'str'), True,  True),
+    'improved_bubble_sort': (sorting.improved_bubble_sort, ('int', 'wide-int', 'str'), True,  True),
+    'odd_even_sort':        (sorting.odd_even_sort,        ('int', 'wide-int', 'str'), True,  True),
+    'cocktail_sort':        (sorting.cocktail_sort,        ('int', 'wide-int', 'str'), True,  True),
+    'insertion_sort':       (sorting.insertion_sort,       ('int', 'wide-int', 'str'), True,  True),
+    'gnome_sort':           (sorting.gnome_sort,           ('int', 'wide-int', 'str'), True,  True),
+    'quicksort':            (sorting.quicksort,            ('int', 'wide-int', 'str'), True,  True),
+    'comb_sort':            (sorting.comb_sort,            ('int', 'wide-int', 'str'), False, True),
+    'heap_sort':            (sorting.heap_sort,            ('int', 'wide-int', 'str'), False, True),
+    'merge_sort':           (sorting.merge_sort,           ('int', 'wide-int', 'str'), False, True),
+    'natural_merge_sort':   (sorting.natural_merge_sort,   ('int', 'wide-int', 'str'), False, True),
+    'introsort':            (sorting.introsort,            ('int', 'wide-int', 'str'), False, True),
+    'smart_sort':           (sorting.smart_sort,           ('int', 'wide-int', 'str'), False, False),
+    'parallel_sort':        (sorting.parallel_sort,        ('int', 'wide-int', 'str'), False, False),
+    'external_sort':        (_external_sort,               ('int', 'wide-int', 'str'), False, True),
+    'counting_sort':        (sorting.counting_sort,        ('int',),                   False, False),
+    'bucket_sort':          (sorting.bucket_sort,          ('int',),                   False, False),
+    'lsd_radix_sort':       (sorting.lsd_radix_sort,       ('int', 'wide-int'),        False, False),
+    'msd_radix_sort':       (sorting.msd_radix_sort,       ('str',),                   False, False),
+    'builtin_sort':         (list.sort,                    ('int', 'wide-int', 'str'), False, True),
+}
+
+#Algorithms skipped past RECURSIVE_CAP whatever the quadratic cap.
+RECURSIVE_ALGORITHMS = {'quicksort'}
+
+
+#Benchmarks the sorting algorithms and returns the list of records.
+def bench_sorting(algorithms, distributions, sizes, repeat = DEFAULT_REPEAT, warmup = DEFAULT_WARMUP,
+                  seed = DEFAULT_SEED, quadratic_cap = QUADRATIC_CAP, instrument_cap = INSTRUMENT_CAP, log = None):
+    records = []
+    for distribution in distributions:
+        kind = DISTRIBUTIONS[distribution][1]
+        for n in sizes:
+            data = generate(distribution, n, seed)
+            expected = sorted(data)
+            for name in algorithms:
+                function, kinds, quadratic, count_comparisons = SORTING_ALGORITHMS[name]
+                if kind not in kinds or (quadratic and n > quadratic_cap) or (name in RECURSIVE_ALGORITHMS and n > RECURSIVE_CAP):
+                    continue
+                record = {'suite': 'sorting', 'algorithm': name, 'distribution': distribution,
+                          'size': n, 'seed': seed, 'repeat': repeat, 'warmup': warmup,
+                          'best': None, 'mean': None, 'median': None,
+                          'comparisons': None, 'writes': None, 'ok': False, 'error': None}
+                try:
+                    lst = list(data)
+                    function(lst)
+                    record['ok'] = lst == expected
+                    record.update(_summarize(_time_runs(function, data, repeat, warmup)))
+                    if n <= instrument_cap:
+                        record['comparisons'], record['writes'] = _instrument(function, data, count_comparisons)
+                except Exception as e:
+                    record['error'] = '%s: %s' % (type(e).__name__, e)
+                records.append(record)
+                if log is not None:
+                    log.write('%-22s %-14s %9d  %s\n' % (name, distribution, n,
+                              record['error'] or '%.6fs%s' % (record['best'], '' if record['ok'] else '  NOT SORTED')))
+    return records
+
+
+#-------------------------------Heap benchmarks--------------------------------
+
+#Gives the heapq module the heaps' API (used as the baseline).
+class _HeapqHeap:
+    def __init__(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def insert(self, value):
+        heapq.heappush(self._heap, value)
+
+    def insert_array(self, array):
+        self._heap.extend(array)
+        heapq.heapify(self._heap)
+
+    def pop(self):
+        return heapq.heappop(self._heap) if self._heap else None
+
+
+#Name -> function returning a new empty heap.
+HEAPS = {
+    'BinaryHeap':       data_structures.BinaryHeap,
+    'BinaryHeap(d)':    lambda: data_structures.BinaryHeap(typecode='d'),
+    'IndexedBinaryHeap': data_structures.IndexedBinaryHeap,
+    'DaryHeap(4)':      lambda: data_structures.DaryHeap(4),
+    'DaryHeap(8)':      lambda: data_structures.DaryHeap(8),
+    'PairingHeap':      data_structures.PairingHeap,
+    'heapq':            _HeapqHeap,
+}
+
+
+#Each workload runs on a new heap and returns the list of popped values.
+
+#Inserts the values one by one then pops them all.
+def _insert_pop(heap, data):
+    for val in data:
+        heap.insert(val)
+    return [heap.pop() for _ in range(len(data))]
+
+#Inserts all the values at once then pops them all.
+def _heapify_pop(heap, data):
+    heap.insert_array(data)
+    return [heap.pop() for _ in range(len(data))]
+
+#Inserts the values, popping one value after every second insertion
+#(e.g. a scheduler's queue), then pops the remaining values.
+def _mixed(heap, data):
+    popped = []
+    for i, val in enumerate(data):
+        heap.insert(val)
+        if i & 1:
+            popped.append(heap.pop())
+    popped.extend(heap.pop() for _ in range(len(heap)))
+    return popped
+
+
+WORKLOADS = {
+    'insert-pop':  _insert_pop,
+    'heapify-pop': _heapify_pop,
+    'mixed':       _mixed,
+}
+
+
+#Benchmarks the heaps and returns the list of records. The values are the
+#distribution's integers converted to floats (to allow typed priorities).
+def bench_heaps(structures, workloads, distributions, sizes, repeat = DEFAULT_REPEAT,
+                warmup = DEFAULT_WARMUP, seed = DEFAULT_SEED, log = None):
+    records = []
+    for distribution in distributions:
+        for n in sizes:
+            data = [float(val) for val in generate(distribution, n, seed)]
+            for workload_name in workloads:
+                workload = WORKLOADS[workload_name]
+                expected = workload(_HeapqHeap(), data)
+                for name in structures:
+                    factory = HEAPS[name]
+                    function = lambda lst: workload(factory(), lst)
+                    record = {'suite': 'heaps', 'structure': name, 'workload': workload_name,
+                              'distribution': distribution, 'size': n, 'seed': seed,
+                              'repeat': repeat, 'warmup': warmup,
+                              'best': None, 'mean': None, 'median': None, 'ok': False, 'error': None}
+                    try:
+                        record['ok'] = function(list(data)) == expected
+                        record.update(_summarize(_time_runs(function, data, repeat, warmup)))
+                    except Exception as e:
+                        record['error'] = '%s: %s' % (type(e).__name__, e)
+                    records.append(record)
+                    if log is not None:
+                        log.write('%-18s %-12s %-14s %9d  %s\n' % (name, workload_name, distribution, n,
+                                  record['error'] or '%.6fs%s' % (record['best'], '' if record['ok'] else '  WRONG ORDER')))
+    return records
+
+
+#------------------------------Search benchmarks-------------------------------
+
+#Name -> function building a structure from the sorted keys and returning
+#a function telling if a key is present.
+SEARCH_STRUCTURES = {
+    'binary_search':       lambda keys: lambda x: array_search.binary_search(keys, x) != -1,
+    'bisect':              lambda keys: lambda x: _bisect_contains(keys, x),
+    'StaticSearchTree':    lambda keys: trees.StaticSearchTree(keys).contains,
+    'StaticSearchTree(q)': lambda keys: trees.StaticSearchTree(keys, 'q').contains,
+    'ArrayBST.from_sorted': lambda keys: trees.ArrayBST.from_sorted(keys).contains,
+}
+
+
+#Returns a boolean indicating if x is in the sorted keys (used as the baseline).
+def _bisect_contains(keys, x):
+    i = bisect.bisect_left(keys, x)
+    return i < len(keys) and keys[i] == x
+
+
+#Benchmarks the lookups of the search structures and returns the list of records.
+#The keys are n distinct integers in [0, 4n[, so about a quarter of the queries
+#(uniform in the same range) are hits. The build time is measured separately.
+def bench_search(structures, sizes, queries = DEFAULT_QUERIES, repeat = DEFAULT_REPEAT,
+                 warmup = DEFAULT_WARMUP, seed = DEFAULT_SEED, log = None):
+    records = []
+    for n in sizes:
+        rng = random.Random(seed)
+        keys = sorted(rng.sample(range(4 * n), n))
+        lookups = [rng.randrange(4 * n) for _ in range(queries)]
+        expected = [_bisect_contains(keys, x) for x in lookups]
+        for name in structures:
+            record = {'suite': 'search', 'structure': name, 'size': n, 'queries': queries, 'seed': seed,
+                      'repeat': repeat, 'warmup': warmup, 'build': None,
+                      'best': None, 'mean': None, 'median': None, 'ok': False, 'error': None}
+            try:
+                start = time.perf_counter()
+                contains = SEARCH_STRUCTURES[name](keys)
+                record['build'] = time.perf_counter() - start
+                function = lambda data: [contains(x) for x in data]
+                record['ok'] = function(lookups) == expected
+                record.update(_summarize(_time_runs(function, lookups, repeat, warmup)))
+            except Exception as e:
+                record['error'] = '%s: %s' % (type(e).__name__, e)
+            records.append(record)
+            if log is not None:
+                log.write('%-20s %9d  %s\n' % (name, n,
+                          record['error'] or '%.6fs%s' % (record['best'], '' if record['ok'] else '  WRONG RESULT')))
+    return records
+
+
+#------------------------------------Output------------------------------------
+
+#Writes the records as JSON (with the environment's description) or as CSV.
+def write_records(records, output, fmt = 'json'):
+    if fmt == 'csv':
+        if records:
+            writer = csv.DictWriter(output, fieldnames=list(records[0].keys()))
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        json.dump({'python': platform.python_version(),
+                   'implementation': platform.python_implementation(),
+                   'machine': platform.machine(),
+                   'records': records}, output, indent=2)
+        output.write('\n')
+
+
+#Returns the list of integers given as a comma separated string.
+def _int_list(text):
+    return [int(val) for val in text.split(',')]
+
+
+#Returns the list of names given as a comma separated string, checking them against the choices.
+def _name_list(choices):
+    def parse(text):
+        names = text.split(',')
+        for name in names:
+            if name not in choices:
+                raise argparse.ArgumentTypeError('unknown name: %s (choose from %s)' % (name, ', '.join(choices)))
+        return names
+    return parse
+
+
+#Builds the command line parser.
+def _build_parser():
+    parser = argparse.ArgumentParser(prog='python -m sneklib.bench', description='Benchmarks the algorithms of sneklib.')
+    suites = parser.add_subparsers(dest='suite', required=True)
+
+    parser_sorting = suites.add_parser('sorting', help='benchmark the sorting algorithms')
+    parser_sorting.add_argument('--algorithms', type=_name_list(SORTING_ALGORITHMS), default=list(SORTING_ALGORITHMS))
+    parser_sorting.add_argument('--distributions', type=_name_list(DISTRIBUTIONS), default=list(DISTRIBUTIONS))
+    parser_sorting.add_argument('--sizes', type=_int_list, default=DEFAULT_SIZES)
+    parser_sorting.add_argument('--quadratic-cap', type=int, default=QUADRATIC_CAP)
+    parser_sorting.add_argument('--instrument-cap', type=int, default=INSTRUMENT_CAP)
+
+    int_distributions = [name for name, (_, kind) in DISTRIBUTIONS.items() if kind != 'str']
+    parser_heaps = suites.add_parser('heaps', help='benchmark the heaps')
+    parser_heaps.add_argument('--structures', type=_name_list(HEAPS), default=list(HEAPS))
+    parser_heaps.add_argument('--workloads', type=_name_list(WORKLOADS), default=list(WORKLOADS))
+    parser_heaps.add_argument('--distributions', type=_name_list(int_distributions), default=['random', 'sorted', 'reversed'])
+    parser_heaps.add_argument('--sizes', type=_int_list, default=DEFAULT_SIZES[:-1])
+
+    parser_search = suites.add_parser('search', help='benchmark the lookups in sorted keys')
+    parser_search.add_argument('--structures', type=_name_list(SEARCH_STRUCTURES), default=list(SEARCH_STRUCTURES))
+    parser_search.add_argument('--sizes', type=_int_list, default=DEFAULT_SIZES[:-1])
+    parser_search.add_argument('--queries', type=int, default=DEFAULT_QUERIES)
+
+    for suite_parser in suites.choices.values():
+        suite_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+        suite_parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+        suite_parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+        suite_parser.add_argument('--format', choices=('json', 'csv'), default='json')
+        suite_parser.add_argument('--output', help='file to write the records to (standard output by default)')
+        suite_parser.add_argument('--quiet', action='store_true', help='do not log the progress on standard error')
+    return parser
+
+
+#Runs the benchmark suite given on the command line.
+def main(argv = None):
+    args = _build_parser().parse_args(argv)
+    log = None if args.quiet else sys.stderr
+
+    if args.suite == 'sorting':
+        records = bench_sorting(args.algorithms, args.distributions, args.sizes, args.repeat, args.warmup,
+                                args.seed, args.quadratic_cap, args.instrument_cap, log)
+    elif args.suite == 'heaps':
+        records = bench_heaps(args.structures, args.workloads, args.distributions, args.sizes,
+                              args.repeat, args.warmup, args.seed, log)
+    elif args.suite == 'search':
+        records = bench_search(args.structures, args.sizes, args.queries, args.repeat, args.warmup, args.seed, log)
+
+    if args.output is None:
+        write_records(records, sys.stdout, args.format)
+    else:
+        with open(args.output, 'w', newline='') as output:
+            write_records(records, output, args.format)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,17 @@
 #File:   data_structures.py
 #Desc.:  A module containing my implementation of various data structures.
 
+import array
+import asyncio
+import collections
+import functools
+import queue
+import random
+import struct
+import sys
+import threading
+import time
+
 
 #----------------------------------Array BST-----------------------------------
 
@@ -196,51 +207,107 @@ class ArrayBST:
 
 #---------------------------------Binary heap----------------------------------
 
-#Class used to represent an entry in the binary heap.
-class HeapEntry:
-    def __init__(self, value, priority):
-        self.value = value
-        self.priority = priority
-
-
-#Binary heap implemeneted using a dynamic array (list).
+#Binary (min) heap implemented using parallel dynamic arrays holding the values
+#and the priorities (which can be a typed array, e.g. typecode='d' for floats).
+#Insert: O(log(n))   Pop: O(log(n))   Peek: O(1)   Insert n entries: O(n)
 class BinaryHeap:
-    DEFAULT_SIZE = 10 #Default initial size of the underlying array.
-    DEFAULT_GROWTH_RATE = 2 #Default rate at which the underlying array's size increases when resized.
+    DEFAULT_SIZE = 10 #Default initial size of the underlying arrays.
+    DEFAULT_GROWTH_RATE = 2 #Default rate at which the underlying arrays' size increases when resized.
 
-    def __init__(self, initial_size = DEFAULT_SIZE, growth_rate = DEFAULT_GROWTH_RATE):
+    def __init__(self, initial_size = DEFAULT_SIZE, growth_rate = DEFAULT_GROWTH_RATE, typecode = None):
         self._cur_size = 0
-        self._max_size = max(initial_size + 1, 1)
+        self._max_size = max(initial_size + 1, 1) #Index 0 is unused.
         self._growth_rate = growth_rate if growth_rate > 1 else self.DEFAULT_GROWTH_RATE
-        self._entries = [None for i in range(self._max_size)]
+        self._typecode = typecode
+        self._values = [None] * self._max_size
+        self._priorities = self._new_priorities(self._max_size)
+
+    #Returns the number of entries in the heap.
+    def __len__(self):
+        return self.size()
+
+    #Returns an array able to hold the given number of priorities.
+    def _new_priorities(self, size):
+        if self._typecode is None:
+            return [None] * size
+        return array.array(self._typecode, [0]) * size
 
-    #Resizes the underlying array according to the set growth rate.
+    #Resizes the underlying arrays according to the set growth rate.
     def _enlarge(self):
-        new_size = self._max_size * self._growth_rate + 1
-        delta =  new_size - self._cur_size #+1 is to insure the size doesn't get stuck at 0.
-        self._entries.extend([None for i in range(delta)])
+        new_size = self._max_size * self._growth_rate + 1 #+1 is to insure the size doesn't get stuck at 0.
+        delta = new_size - self._max_size
+        self._values.extend([None] * delta)
+        self._priorities.extend(self._new_priorities(delta))
         self._max_size = new_size
 
-    #Percolates an entry down to it's right position.
+    #Appends an entry at the end of the underlying arrays without restoring the heap order.
+    def _append_entry(self, value, priority):
+        if self._cur_size == self._max_size-1:
+            self._enlarge()
+        self._cur_size += 1
+        self._values[self._cur_size] = value
+        self._priorities[self._cur_size] = priority
+
+    #Moves the entry at index src to index dst.
+    def _move(self, dst, src):
+        self._values[dst] = self._values[src]
+        self._priorities[dst] = self._priorities[src]
+
+    #Releases the value (and the priority unless it is in a typed array) at the given index.
+    def _clear_entry(self, index):
+        self._values[index] = None
+        if self._typecode is None:
+            self._priorities[index] = None
+
+    #Replaces the entry at the top of the heap without restoring the heap order.
+    def _replace_top(self, value, priority):
+        self._values[1] = value
+        self._priorities[1] = priority
+
+    #Percolates an entry down to its right position.
     def _percolate_down(self, hole):
-        tmp = HeapEntry(self._entries[hole].value, self._entries[hole].priority)
-        while hole * 2 <= self._cur_size:
-            child = hole * 2
-            if child != self._cur_size and self._entries[child+1].priority < self._entries[child].priority:
+        values, priorities = self._values, self._priorities
+        size = self._cur_size
+        value, priority = values[hole], priorities[hole]
+        child = hole * 2
+        while child <= size:
+            if child != size and priorities[child+1] < priorities[child]:
                 child += 1
-            if self._entries[child].priority < tmp.priority:
-                self._entries[hole] = self._entries[child]
-            else:
+            if not priorities[child] < priority:
                 break
+            values[hole], priorities[hole] = values[child], priorities[child]
             hole = child
-        self._entries[hole] = tmp
-
-    #Percolates an entry up to it's right position.
-    def _percolate_up(self, hole, entry):
-        while hole > 1 and entry.priority < self._entries[hole//2].priority:
-            self._entries[hole] = HeapEntry(self._entries[hole//2].value, self._entries[hole//2].priority)
+            child = hole * 2
+        values[hole], priorities[hole] = value, priority
+
+    #Percolates an entry up to its right position.
+    def _percolate_up(self, hole):
+        values, priorities = self._values, self._priorities
+        value, priority = values[hole], priorities[hole]
+        while hole > 1 and priority < priorities[hole//2]:
+            values[hole], priorities[hole] = values[hole//2], priorities[hole//2]
             hole //= 2
-        self._entries[hole] = entry
+        values[hole], priorities[hole] = value, priority
+
+    #Restores the heap order of the whole underlying arrays bottom-up.
+    #Complexity: O(n)
+    def _heapify(self):
+        for hole in range(self._cur_size // 2, 0, -1):
+            self._percolate_down(hole)
+
+    #Removes the entry at the given index and returns its value.
+    def _remove_at(self, index):
+        value = self._values[index]
+        last = self._cur_size
+        if index != last:
+            self._move(index, last)
+        self._clear_entry(last)
+        self._cur_size -= 1
+        if index <= self._cur_size:
+            #If the moved entry goes up, the one taking its place doesn't go down.
+            self._percolate_up(index)
+            self._percolate_down(index)
+        return value
 
     #Returns the number of entries in the heap.
     def size(self):
@@ -250,21 +317,365 @@ class BinaryHeap:
     def empty(self):
         return self.size() == 0
 
+    #Removes every entry in the heap.
+    def clear(self):
+        for i in range(1, self._cur_size + 1):
+            self._clear_entry(i)
+        self._cur_size = 0
+
     #Returns the value at the top of the heap without removing it.
     def peek(self):
         if self.empty():
             return None
-        return entries[1].value
+        return self._values[1]
+
+    #Returns the priority of the value at the top of the heap without removing it.
+    def peek_priority(self):
+        if self.empty():
+            return None
+        return self._priorities[1]
 
     #Returns the value at the top of the heap and removes it.
     def pop(self):
         if self.empty():
             return None
-        val = self._entries[1].value
-        self._entries[1] = self._entries[self._cur_size]
-        self._cur_size -= 1
+        return self._remove_at(1)
+
+    #Inserts an new entry in the heap (the value is considered as being the priority as well).
+    def insert(self, value):
+        self.insert_pair(value, value)
+
+    #Inserts an new entry in the heap.
+    def insert_pair(self, value, priority):
+        self._append_entry(value, priority)
+        self._percolate_up(self._cur_size)
+
+    #Inserts every element of the array in the heap (the value is considered as being the priority as well).
+    def insert_array(self, array):
+        self.insert_pair_array([(e, e) for e in array])
+
+    #Inserts every element of the array, given as (value, priority) tuples/lists, in the heap.
+    #The entries are appended then the heap is rebuilt bottom-up in O(n) unless
+    #only a few entries are added to a larger heap, in which case they are inserted one by one.
+    def insert_pair_array(self, array):
+        if len(array) < self._cur_size:
+            for e in array:
+                self.insert_pair(e[0], e[1])
+            return
+        for e in array:
+            self._append_entry(e[0], e[1])
+        self._heapify()
+
+    #Inserts a new entry (the value being the priority as well) then pops the top of the heap.
+    def pushpop(self, value):
+        return self.pushpop_pair(value, value)
+
+    #Inserts a new entry then pops and returns the value at the top of the heap,
+    #faster than calling insert_pair() then pop().
+    def pushpop_pair(self, value, priority):
+        if self.empty() or not self._priorities[1] < priority:
+            return value
+        top = self._values[1]
+        self._replace_top(value, priority)
         self._percolate_down(1)
-        return val
+        return top
+
+    #Pops the value at the top of the heap then inserts a new entry
+    #(the value being the priority as well).
+    def replace(self, value):
+        return self.replace_pair(value, value)
+
+    #Pops and returns the value at the top of the heap (None if it is empty)
+    #then inserts a new entry, faster than calling pop() then insert_pair().
+    def replace_pair(self, value, priority):
+        if self.empty():
+            self.insert_pair(value, priority)
+            return None
+        top = self._values[1]
+        self._replace_top(value, priority)
+        self._percolate_down(1)
+        return top
+
+
+#Binary heap whose entries can be accessed through the handles returned on
+#insertion, allowing to change their priority or to remove them (e.g. to
+#implement Dijkstra's and A* algorithms or schedulers). The entries inserted
+#through pushpop() and replace() are given handles which aren't returned.
+#Decrease key: O(log(n))   Remove: O(log(n))
+class IndexedBinaryHeap(BinaryHeap):
+    def __init__(self, initial_size = BinaryHeap.DEFAULT_SIZE, growth_rate = BinaryHeap.DEFAULT_GROWTH_RATE, typecode = None):
+        super().__init__(initial_size, growth_rate, typecode)
+        self._handles = [None] * self._max_size
+        self._positions = {} #Handle -> index in the underlying arrays.
+        self._next_handle = 0
+
+    #Returns a new handle.
+    def _new_handle(self):
+        handle = self._next_handle
+        self._next_handle += 1
+        return handle
+
+    #Also enlarges the array of handles.
+    def _enlarge(self):
+        old_size = self._max_size
+        super()._enlarge()
+        self._handles.extend([None] * (self._max_size - old_size))
+
+    #Also gives a new handle to the appended entry.
+    def _append_entry(self, value, priority):
+        super()._append_entry(value, priority)
+        handle = self._new_handle()
+        self._handles[self._cur_size] = handle
+        self._positions[handle] = self._cur_size
+
+    #Also moves the entry's handle and updates its position.
+    def _move(self, dst, src):
+        super()._move(dst, src)
+        self._handles[dst] = self._handles[src]
+        self._positions[self._handles[dst]] = dst
+
+    #Also replaces the top entry's handle by a new one.
+    def _replace_top(self, value, priority):
+        super()._replace_top(value, priority)
+        del self._positions[self._handles[1]]
+        handle = self._new_handle()
+        self._handles[1] = handle
+        self._positions[handle] = 1
+
+    #Percolates an entry down to its right position, keeping track of the handles' positions.
+    def _percolate_down(self, hole):
+        values, priorities, handles, positions = self._values, self._priorities, self._handles, self._positions
+        size = self._cur_size
+        value, priority, handle = values[hole], priorities[hole], handles[hole]
+        child = hole * 2
+        while child <= size:
+            if child != size and priorities[child+1] < priorities[child]:
+                child += 1
+            if not priorities[child] < priority:
+                break
+            values[hole], priorities[hole], handles[hole] = values[child], priorities[child], handles[child]
+            positions[handles[hole]] = hole
+            hole = child
+            child = hole * 2
+        values[hole], priorities[hole], handles[hole] = value, priority, handle
+        positions[handle] = hole
+
+    #Percolates an entry up to its right position, keeping track of the handles' positions.
+    def _percolate_up(self, hole):
+        values, priorities, handles, positions = self._values, self._priorities, self._handles, self._positions
+        value, priority, handle = values[hole], priorities[hole], handles[hole]
+        while hole > 1 and priority < priorities[hole//2]:
+            values[hole], priorities[hole], handles[hole] = values[hole//2], priorities[hole//2], handles[hole//2]
+            positions[handles[hole]] = hole
+            hole //= 2
+        values[hole], priorities[hole], handles[hole] = value, priority, handle
+        positions[handle] = hole
+
+    #Also forgets the removed entry's handle.
+    def _remove_at(self, index):
+        del self._positions[self._handles[index]]
+        return super()._remove_at(index)
+
+    #Removes every entry in the heap.
+    def clear(self):
+        super().clear()
+        self._positions.clear()
+
+    #Returns a boolean indicating whether or not the entry
+    #with the given handle is present in the heap.
+    def contains(self, handle):
+        return handle in self._positions
+
+    #Returns the priority of the entry with the given handle or None if it is not present.
+    def priority(self, handle):
+        index = self._positions.get(handle)
+        return None if index is None else self._priorities[index]
+
+    #Returns the value of the entry with the given handle or None if it is not present.
+    def value(self, handle):
+        index = self._positions.get(handle)
+        return None if index is None else self._values[index]
+
+    #Inserts an new entry in the heap (the value is considered as
+    #being the priority as well) and returns its handle.
+    def insert(self, value):
+        return self.insert_pair(value, value)
+
+    #Inserts an new entry in the heap and returns its handle.
+    def insert_pair(self, value, priority):
+        super().insert_pair(value, priority)
+        return self._next_handle - 1
+
+    #Inserts every element of the array in the heap (the value is considered
+    #as being the priority as well) and returns the list of their handles.
+    def insert_array(self, array):
+        return self.insert_pair_array([(e, e) for e in array])
+
+    #Inserts every element of the array, given as (value, priority) tuples/lists,
+    #in the heap and returns the list of their handles.
+    def insert_pair_array(self, array):
+        first_handle = self._next_handle
+        super().insert_pair_array(array)
+        return list(range(first_handle, self._next_handle))
+
+    #Sets the priority of the entry with the given handle (usually to a lower
+    #priority, but a higher one is supported as well) if it is present.
+    def decrease_key(self, handle, priority):
+        index = self._positions.get(handle)
+        if index is None:
+            return
+        old_priority = self._priorities[index]
+        self._priorities[index] = priority
+        if priority < old_priority:
+            self._percolate_up(index)
+        else:
+            self._percolate_down(index)
+
+    #Removes the entry with the given handle from the heap
+    #and returns its value (None if it is not present).
+    def remove(self, handle):
+        index = self._positions.get(handle)
+        if index is None:
+            return None
+        return self._remove_at(index)
+
+
+
+#----------------------------------d-ary heap----------------------------------
+
+#Heap where each node has d children instead of 2, sharing BinaryHeap's API.
+#A higher arity makes the heap shallower (fewer, more cache friendly, percolate
+#steps on insertion) at the cost of more comparisons per level when popping.
+#Insert: O(log_d(n))   Pop: O(d*log_d(n))   Peek: O(1)
+class DaryHeap(BinaryHeap):
+    DEFAULT_ARITY = 4 #Default number of children of each node.
+
+    def __init__(self, arity = DEFAULT_ARITY, initial_size = BinaryHeap.DEFAULT_SIZE,
+                 growth_rate = BinaryHeap.DEFAULT_GROWTH_RATE, typecode = None):
+        super().__init__(initial_size, growth_rate, typecode)
+        self._arity = max(arity, 2)
+
+    #Percolates an entry down to its right position (the children
+    #of the node at index i are at indices d*(i-1)+2 to d*i+1).
+    def _percolate_down(self, hole):
+        values, priorities = self._values, self._priorities
+        size, arity = self._cur_size, self._arity
+        value, priority = values[hole], priorities[hole]
+        first = arity * (hole - 1) + 2
+        while first <= size:
+            child, child_priority = first, priorities[first]
+            for i in range(first + 1, min(first + arity, size + 1)):
+                if priorities[i] < child_priority:
+                    child, child_priority = i, priorities[i]
+            if not child_priority < priority:
+                break
+            values[hole], priorities[hole] = values[child], child_priority
+            hole = child
+            first = arity * (hole - 1) + 2
+        values[hole], priorities[hole] = value, priority
+
+    #Percolates an entry up to its right position (the parent
+    #of the node at index i is at index (i-2)//d+1).
+    def _percolate_up(self, hole):
+        values, priorities = self._values, self._priorities
+        arity = self._arity
+        value, priority = values[hole], priorities[hole]
+        while hole > 1:
+            parent = (hole - 2) // arity + 1
+            if not priority < priorities[parent]:
+                break
+            values[hole], priorities[hole] = values[parent], priorities[parent]
+            hole = parent
+        values[hole], priorities[hole] = value, priority
+
+    #Restores the heap order of the whole underlying arrays bottom-up.
+    #Complexity: O(n)
+    def _heapify(self):
+        for hole in range((self._cur_size - 2) // self._arity + 1, 0, -1):
+            self._percolate_down(hole)
+
+
+
+#---------------------------------Pairing heap---------------------------------
+
+#Class used to represent a node in a pairing heap
+#(its children are linked through their sibling).
+class PairingHeapNode:
+    __slots__ = ('value', 'priority', 'child', 'sibling')
+
+    def __init__(self, value, priority):
+        self.value = value
+        self.priority = priority
+        self.child = None
+        self.sibling = None
+
+
+#Pairing (min) heap: a heap-ordered multiway tree whose subtrees are merged
+#in pairs when the root is popped. Two heaps can be melded in constant time.
+#Insert: O(1)   Meld: O(1)   Peek: O(1)   Pop: O(log(n)) amortized
+class PairingHeap:
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    #Returns the number of entries in the heap.
+    def __len__(self):
+        return self.size()
+
+    #Links two trees by making the root with the greatest priority
+    #the first child of the other one and returns the resulting root.
+    def _link(self, first, second):
+        if second.priority < first.priority:
+            first, second = second, first
+        second.sibling = first.child
+        first.child = second
+        return first
+
+    #Returns the number of entries in the heap.
+    def size(self):
+        return self._size
+
+    #Returns a boolean indicating if the heap is empty.
+    def empty(self):
+        return self._size == 0
+
+    #Removes every entry in the heap.
+    def clear(self):
+        self._root = None
+        self._size = 0
+
+    #Returns the value at the top of the heap without removing it.
+    def peek(self):
+        return None if self._root is None else self._root.value
+
+    #Returns the priority of the value at the top of the heap without removing it.
+    def peek_priority(self):
+        return None if self._root is None else self._root.priority
+
+    #Returns the value at the top of the heap and removes it. Its children
+    #are linked in pairs from left to right, then the resulting trees
+    #are linked from right to left into the new root (two-pass pairing).
+    def pop(self):
+        if self._root is None:
+            return None
+        value = self._root.value
+        pairs = []
+        node = self._root.child
+        while node is not None:
+            second = node.sibling
+            if second is None:
+                pairs.append(node)
+                break
+            next_node = second.sibling
+            node.sibling = second.sibling = None
+            pairs.append(self._link(node, second))
+            node = next_node
+        root = pairs.pop() if pairs else None
+        while pairs:
+            root = self._link(pairs.pop(), root)
+        self._root = root
+        self._size -= 1
+        return value
 
     #Inserts an new entry in the heap (the value is considered as being the priority as well).
     def insert(self, value):
@@ -272,23 +683,244 @@ class BinaryHeap:
 
     #Inserts an new entry in the heap.
     def insert_pair(self, value, priority):
-        if self._cur_size == self._max_size-1:
-            self._enlarge()
-        hole = self._cur_size + 1
-        self._cur_size += 1
-        new_entry = HeapEntry(value, priority)
-        self._percolate_up(hole, new_entry)
+        node = PairingHeapNode(value, priority)
+        self._root = node if self._root is None else self._link(self._root, node)
+        self._size += 1
 
     #Inserts every element of the array in the heap (the value is considered as being the priority as well).
     def insert_array(self, array):
         for e in array:
-            self.insert(e)
+            self.insert_pair(e, e)
 
     #Inserts every element of the array, given as (value, priority) tuples/lists, in the heap.
     def insert_pair_array(self, array):
         for e in array:
             self.insert_pair(e[0], e[1])
 
+    #Moves every entry of the other pairing heap into this one (the other heap is emptied).
+    def meld(self, other):
+        if other is self or other._root is None:
+            return
+        self._root = other._root if self._root is None else self._link(self._root, other._root)
+        self._size += other._size
+        other.clear()
+
+
+
+#---------------------------Concurrent priority queues-------------------------
+
+#Thread-safe priority queue built on one of the package's heaps (a BinaryHeap by
+#default, so the values come out in the same order). When a maximum size is set,
+#put() blocks while the queue is full (backpressure). The lock is only held while
+#the heap is updated; put_many() and get_many() update it by batches.
+#Follows the conventions of the queue module: block/timeout arguments and
+#queue.Full/queue.Empty raised when the queue stays full/empty.
+class ConcurrentPriorityQueue:
+    def __init__(self, maxsize = 0, heap_factory = BinaryHeap):
+        self._heap = heap_factory()
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    #Returns the number of values in the queue.
+    def __len__(self):
+        return self.size()
+
+    #Returns the number of free slots (None if the queue is unbounded).
+    def _free_slots(self):
+        return None if self._maxsize <= 0 else self._maxsize - self._heap.size()
+
+    #Waits on the condition until the predicate is true. Raises the given
+    #exception if it isn't when not blocking or once the deadline is passed.
+    def _wait(self, condition, predicate, block, deadline, exception):
+        if predicate():
+            return
+        if not block:
+            raise exception
+        if deadline is None:
+            condition.wait_for(predicate)
+        elif not condition.wait_for(predicate, deadline - time.monotonic()):
+            raise exception
+
+    #Returns the deadline corresponding to the given timeout (None if there is none).
+    def _deadline(self, timeout):
+        return None if timeout is None else time.monotonic() + timeout
+
+    #Returns the number of values in the queue.
+    def size(self):
+        with self._lock:
+            return self._heap.size()
+
+    #Returns a boolean indicating if the queue is empty.
+    def empty(self):
+        return self.size() == 0
+
+    #Returns a boolean indicating if the queue is full.
+    def full(self):
+        with self._lock:
+            return self._maxsize > 0 and self._heap.size() >= self._maxsize
+
+    #Inserts a value with the given priority (the value itself by default),
+    #waiting for a free slot if the queue is full.
+    def put(self, value, priority = None, block = True, timeout = None):
+        with self._not_full:
+            self._wait(self._not_full, lambda: self._free_slots() != 0, block, self._deadline(timeout), queue.Full)
+            self._heap.insert_pair(value, value if priority is None else priority)
+            self._not_empty.notify()
+
+    #Inserts every value, given as (value, priority) tuples if with_priorities is set
+    #to True, by batches as large as the free slots allow. If the queue stays full
+    #until the timeout expires, queue.Full is raised and only the first values were inserted.
+    def put_many(self, values, with_priorities = False, block = True, timeout = None):
+        pairs = list(values) if with_priorities else [(value, value) for value in values]
+        deadline = self._deadline(timeout)
+        start = 0
+        with self._not_full:
+            while start < len(pairs):
+                self._wait(self._not_full, lambda: self._free_slots() != 0, block, deadline, queue.Full)
+                free_slots = self._free_slots()
+                end = len(pairs) if free_slots is None else min(start + free_slots, len(pairs))
+                self._heap.insert_pair_array(pairs[start:end])
+                self._not_empty.notify(end - start)
+                start = end
+
+    #Removes and returns the value with the lowest priority,
+    #waiting for one to be inserted if the queue is empty.
+    def get(self, block = True, timeout = None):
+        with self._not_empty:
+            self._wait(self._not_empty, lambda: not self._heap.empty(), block, self._deadline(timeout), queue.Empty)
+            value = self._heap.pop()
+            self._not_full.notify()
+            return value
+
+    #Removes and returns (in order) up to max_values values with the lowest priorities,
+    #waiting for at least one value to be inserted if the queue is empty.
+    def get_many(self, max_values, block = True, timeout = None):
+        with self._not_empty:
+            self._wait(self._not_empty, lambda: not self._heap.empty(), block, self._deadline(timeout), queue.Empty)
+            values = [self._heap.pop() for _ in range(min(max_values, self._heap.size()))]
+            self._not_full.notify(len(values))
+            return values
+
+
+#Priority queue for asyncio built on one of the package's heaps (a BinaryHeap by
+#default, so the values come out in the same order), whose put() and get() can be
+#awaited. When a maximum size is set, put() waits while the queue is full (backpressure).
+#Follows the conventions of asyncio.Queue: the *_nowait() methods raise
+#asyncio.QueueFull/asyncio.QueueEmpty and the timeouts raise asyncio.TimeoutError.
+#Not thread-safe: it must only be used from the event loop's thread.
+class AsyncPriorityQueue:
+    def __init__(self, maxsize = 0, heap_factory = BinaryHeap):
+        self._heap = heap_factory()
+        self._maxsize = maxsize
+        self._getters = collections.deque()
+        self._putters = collections.deque()
+
+    #Returns the number of values in the queue.
+    def __len__(self):
+        return self.size()
+
+    #Returns the number of free slots (None if the queue is unbounded).
+    def _free_slots(self):
+        return None if self._maxsize <= 0 else self._maxsize - self._heap.size()
+
+    #Wakes up (at most) n of the coroutines waiting in the given list.
+    def _wakeup_next(self, waiters, n = 1):
+        while waiters and n > 0:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                n -= 1
+
+    #Waits in the given list until the predicate is true, raising asyncio.TimeoutError
+    #once the deadline is passed. If the wait is interrupted while the predicate
+    #holds, the next coroutine waiting is woken up in its place.
+    async def _wait(self, waiters, predicate, deadline):
+        loop = asyncio.get_running_loop()
+        while not predicate():
+            waiter = loop.create_future()
+            waiters.append(waiter)
+            try:
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                await asyncio.wait_for(waiter, timeout)
+            except BaseException:
+                waiter.cancel()
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if predicate():
+                    self._wakeup_next(waiters)
+                raise
+
+    #Returns the deadline corresponding to the given timeout (None if there is none).
+    def _deadline(self, timeout):
+        return None if timeout is None else asyncio.get_running_loop().time() + timeout
+
+    #Returns the number of values in the queue.
+    def size(self):
+        return self._heap.size()
+
+    #Returns a boolean indicating if the queue is empty.
+    def empty(self):
+        return self._heap.empty()
+
+    #Returns a boolean indicating if the queue is full.
+    def full(self):
+        return self._free_slots() == 0
+
+    #Inserts a value with the given priority (the value itself by default)
+    #without waiting, raising asyncio.QueueFull if the queue is full.
+    def put_nowait(self, value, priority = None):
+        if self.full():
+            raise asyncio.QueueFull
+        self._heap.insert_pair(value, value if priority is None else priority)
+        self._wakeup_next(self._getters)
+
+    #Inserts a value with the given priority (the value itself by default),
+    #waiting for a free slot if the queue is full.
+    async def put(self, value, priority = None, timeout = None):
+        await self._wait(self._putters, lambda: not self.full(), self._deadline(timeout))
+        self.put_nowait(value, priority)
+
+    #Inserts every value, given as (value, priority) tuples if with_priorities is set
+    #to True, by batches as large as the free slots allow. If the queue stays full
+    #until the timeout expires, asyncio.TimeoutError is raised and only the first
+    #values were inserted.
+    async def put_many(self, values, with_priorities = False, timeout = None):
+        pairs = list(values) if with_priorities else [(value, value) for value in values]
+        deadline = self._deadline(timeout)
+        start = 0
+        while start < len(pairs):
+            await self._wait(self._putters, lambda: not self.full(), deadline)
+            free_slots = self._free_slots()
+            end = len(pairs) if free_slots is None else min(start + free_slots, len(pairs))
+            self._heap.insert_pair_array(pairs[start:end])
+            self._wakeup_next(self._getters, end - start)
+            start = end
+
+    #Removes and returns the value with the lowest priority without
+    #waiting, raising asyncio.QueueEmpty if the queue is empty.
+    def get_nowait(self):
+        if self.empty():
+            raise asyncio.QueueEmpty
+        value = self._heap.pop()
+        self._wakeup_next(self._putters)
+        return value
+
+    #Removes and returns the value with the lowest priority,
+    #waiting for one to be inserted if the queue is empty.
+    async def get(self, timeout = None):
+        await self._wait(self._getters, lambda: not self.empty(), self._deadline(timeout))
+        return self.get_nowait()
+
+    #Removes and returns (in order) up to max_values values with the lowest priorities,
+    #waiting for at least one value to be inserted if the queue is empty.
+    async def get_many(self, max_values, timeout = None):
+        await self._wait(self._getters, lambda: not self.empty(), self._deadline(timeout))
+        values = [self._heap.pop() for _ in range(min(max_values, self._heap.size()))]
+        self._wakeup_next(self._putters, len(values))
+        return values
+
 
 
 #-----------------------------Doubly linked list-------------------------------
@@ -307,7 +939,6 @@ class DoublyLinkedList:
     def __init__(self):
         self._front = None
         self._back = None
-        self._current = None
         self._size = 0
 
     #Returns the value of the element at the
@@ -315,21 +946,18 @@ class DoublyLinkedList:
     def __getitem__(self, index):
         return self.at(index)
 
+    #Iterates over the values from the front to the back of the list
+    #(without modifying the list, so it can be iterated by several loops at once).
     def __iter__(self):
-        self._current = self._front
-        return self
+        cur_node = self._front
+        while cur_node is not None:
+            yield cur_node.value
+            cur_node = cur_node.next
 
     #Returns the number of elements present in the list.
     def __len__(self):
         return self.size()
 
-    def __next__(self):
-        if self._current is None:
-            raise StopIteration
-        val = self._current.value
-        self._current = self._current.next
-        return val
-      
     #Builds and returns the string representing the list.      
     def __str__(self):
         result = '['
@@ -379,7 +1007,6 @@ class DoublyLinkedList:
     #Returns the value of the node at the given
     #index or None if the list is empty. 
     def at(self, index):
-        print('at : ' + str(index)) #Debug
         if self.empty():
             return None
         return self._get_node(index).value
@@ -393,13 +1020,11 @@ class DoublyLinkedList:
     def clear(self):
         self._front = None
         self._back = None
-        self._current = None
         self._size = 0
 
     #Returns a boolean indicating whether or
     #not the given value is present in the list.
     def contains(self, value):
-        print('contains : ' + str(value)) #Debug
         return self.find(value) is not None
 
     #Returns a boolean indicating if the list is empty.
@@ -409,7 +1034,6 @@ class DoublyLinkedList:
     #Finds and returns the index of the given
     #value in the list or None if it is not found.
     def find(self, value):
-        print('find : ' + str(value)) #Debug
         if self.empty():
             return None
         i = 0
@@ -426,7 +1050,6 @@ class DoublyLinkedList:
 
     #Inserts the given element in the list at the specified index.
     def insert(self, value, index):
-        print('insert : ' + str(value) + ' , ' + str(index)) #Debug
         if self.empty():
             self.push_front(value)
             return
@@ -446,10 +1069,7 @@ class DoublyLinkedList:
     
     #Removes the last entry in the list but does not return it.
     def pop_back(self):
-        print('pop_back') #Debug
         if not self.empty():
-            if self._current == self._back:
-                self._current = None
             self._back = self._back.prev
             if self._back is not None:
                 self._back.next = None
@@ -457,34 +1077,32 @@ class DoublyLinkedList:
 
     #Removes the first entry in the list but does not return it.
     def pop_front(self):
-        print('pop_front') #Debug
         if not self.empty():
-            if self._current == self._front:
-                self._current = self._front.next
             self._front = self._front.next   
             if self._front is not None:  
                 self._front.prev = None 
             self._size -= 1
 
-    #Appends the given element at the end of the list.
-    def push_back(self, value):
-        print('push_back : ' + str(value)) #Debug
-        new_node = ListNode(value, prev=self._back)
+    #Appends the given node at the end of the list.
+    def _push_node_back(self, node):
+        node.prev = self._back
+        node.next = None
         if self.empty():
-            self._front = new_node
-            self._current = new_node
+            self._front = node
         else:
-            self._back.next = new_node
-        self._back = new_node
+            self._back.next = node
+        self._back = node
         self._size += 1
 
+    #Appends the given element at the end of the list.
+    def push_back(self, value):
+        self._push_node_back(ListNode(value))
+
     #Appends the given element at the start of the list.
     def push_front(self, value):
-        print('push_front : ' + str(value)) #Debug
         new_node = ListNode(value, next=self._front)
         if self.empty():    
             self._back = new_node
-            self._current = new_node
         else:
             self._front.prev = new_node
         self._front = new_node
@@ -492,7 +1110,6 @@ class DoublyLinkedList:
 
     #Removes the element at the given index if the list is not empty.
     def remove_at(self, index):
-        print('remove_at : ' + str(index)) #Debug
         self._remove_node(self._get_node(index))
             
     #Removes the given element from the list if it is present.
@@ -501,7 +1118,6 @@ class DoublyLinkedList:
     #All the occurences of the given element can also be removed at once
     #by setting the parameter "all" to True.
     def remove(self, value, count=1, all=False):
-        print('remove : ' + str(value) + '  count : ' + str(count) + '  all : ' + str(all)) #Debug
         if not self.empty():
             found_count = 0
             cur_node = self._front
@@ -510,9 +1126,9 @@ class DoublyLinkedList:
                     cur_node = cur_node.next
                 else:
                     found_count += 1
-                    if self._current == cur_node:
-                        self._current = cur_node.prev
-                    self._remove_node(cur_node)                  
+                    next_node = cur_node.next
+                    self._remove_node(cur_node)
+                    cur_node = next_node                  
              
     #Returns the number of elements present in the list.
     def size(self):
@@ -520,12 +1136,269 @@ class DoublyLinkedList:
 
 
 
+#----------------------------------Block deque---------------------------------
+
+#Number of values stored in each block of a BlockDeque.
+DEQUE_BLOCK_SIZE = 64
+
+
+#Class used to represent a block of values in a block deque.
+class DequeBlock:
+    __slots__ = ('values', 'prev', 'next')
+
+    def __init__(self, prev = None, next = None):
+        self.values = [None] * DEQUE_BLOCK_SIZE
+        self.prev = prev
+        self.next = next
+
+
+#Double-ended queue storing its values in a doubly linked list of fixed-size
+#blocks (an unrolled linked list) instead of one node per value. Offers the same
+#interface as DoublyLinkedList with O(1) pushes and pops at both ends, O(n/B)
+#indexed access and a fraction of the memory used per value. Iterating doesn't
+#modify the deque, so it can be iterated by several loops at once.
+class BlockDeque:
+    __slots__ = ('_front', '_back', '_left', '_right', '_size')
+
+    def __init__(self, values = None):
+        self.clear()
+        if values is not None:
+            self.extend(values)
+
+    #Returns the value of the element at the
+    #given index or None if the deque is empty.
+    def __getitem__(self, index):
+        return self.at(index)
+
+    #Iterates over the values from the front to the back of the deque.
+    def __iter__(self):
+        block = self._front
+        offset = self._left
+        for _ in range(self._size):
+            yield block.values[offset]
+            offset += 1
+            if offset == DEQUE_BLOCK_SIZE:
+                block = block.next
+                offset = 0
+
+    #Returns the number of elements present in the deque.
+    def __len__(self):
+        return self.size()
+
+    #Iterates over the values from the back to the front of the deque.
+    def __reversed__(self):
+        block = self._back
+        offset = self._right
+        for _ in range(self._size):
+            yield block.values[offset]
+            offset -= 1
+            if offset < 0:
+                block = block.prev
+                offset = DEQUE_BLOCK_SIZE - 1
+
+    #Builds and returns the string representing the deque.
+    def __str__(self):
+        return '[' + ', '.join(str(value) for value in self) + ']'
+
+    #Returns the block containing the value at the given (positive)
+    #index and its offset in that block, starting from the nearest end.
+    #Complexity: O(n/B)
+    def _locate(self, index):
+        if index < self._size - index:
+            position = self._left + index
+            block = self._front
+            for _ in range(position // DEQUE_BLOCK_SIZE):
+                block = block.next
+        else:
+            position = self._right + index - self._size + 1
+            block = self._back
+            for _ in range(-(position // DEQUE_BLOCK_SIZE)):
+                block = block.prev
+        return block, position % DEQUE_BLOCK_SIZE
+
+    #Shifts "count" values by one position, starting at the given (positive) index
+    #where the given value is stored. The values move towards the back of the deque
+    #if forward is True and towards its front otherwise. Returns the value pushed out.
+    #Complexity: O(count + n/B)
+    def _shift(self, index, value, count, forward):
+        block, offset = self._locate(index)
+        for _ in range(count):
+            block.values[offset], value = value, block.values[offset]
+            if forward:
+                offset += 1
+                if offset == DEQUE_BLOCK_SIZE:
+                    block = block.next
+                    offset = 0
+            else:
+                offset -= 1
+                if offset < 0:
+                    block = block.prev
+                    offset = DEQUE_BLOCK_SIZE - 1
+        return value
+
+    #Returns the value of the element at the
+    #given index or None if the deque is empty.
+    #Complexity: O(n/B)
+    def at(self, index):
+        if self.empty():
+            return None
+        block, offset = self._locate(index % self._size) #Python-style indexing.
+        return block.values[offset]
+
+    #Returns the value of the last entry
+    #in the deque or None if it is empty.
+    def back(self):
+        return None if self.empty() else self._back.values[self._right]
+
+    #Removes every entry in the deque.
+    def clear(self):
+        self._front = self._back = DequeBlock()
+        self._left = DEQUE_BLOCK_SIZE // 2 #Leave room on both sides of the first block.
+        self._right = self._left - 1
+        self._size = 0
+
+    #Returns a boolean indicating whether or
+    #not the given value is present in the deque.
+    def contains(self, value):
+        return self.find(value) is not None
+
+    #Returns a boolean indicating if the deque is empty.
+    def empty(self):
+        return self._size == 0
+
+    #Appends the given values at the end of the deque.
+    def extend(self, values):
+        for value in values:
+            self.push_back(value)
+
+    #Finds and returns the index of the given
+    #value in the deque or None if it is not found.
+    def find(self, value):
+        for i, current in enumerate(self):
+            if current == value:
+                return i
+        return None
+
+    #Returns the value of the first entry
+    #in the deque or None if it is empty.
+    def front(self):
+        return None if self.empty() else self._front.values[self._left]
+
+    #Inserts the given element in the deque at the specified index.
+    #The values on the side nearest to the index are moved to make room.
+    #Complexity: O(min(i, n - i) + n/B)
+    def insert(self, value, index):
+        if self.empty():
+            self.push_front(value)
+            return
+        index %= self._size #Python-style indexing.
+        if index < self._size - index:
+            self.push_front(None)
+            self._shift(index, value, index + 1, False)
+        else:
+            self.push_back(None)
+            self._shift(index, value, self._size - index, True)
+
+    #Removes the last entry in the deque and returns it
+    #(or returns None if the deque is empty).
+    def pop_back(self):
+        if self.empty():
+            return None
+        value = self._back.values[self._right]
+        self._back.values[self._right] = None
+        self._right -= 1
+        self._size -= 1
+        if self._right < 0 and self._size > 0:
+            self._back = self._back.prev
+            self._back.next = None
+            self._right = DEQUE_BLOCK_SIZE - 1
+        elif self._size == 0:
+            self.clear()
+        return value
+
+    #Removes the first entry in the deque and returns it
+    #(or returns None if the deque is empty).
+    def pop_front(self):
+        if self.empty():
+            return None
+        value = self._front.values[self._left]
+        self._front.values[self._left] = None
+        self._left += 1
+        self._size -= 1
+        if self._left == DEQUE_BLOCK_SIZE and self._size > 0:
+            self._front = self._front.next
+            self._front.prev = None
+            self._left = 0
+        elif self._size == 0:
+            self.clear()
+        return value
+
+    #Appends the given element at the end of the deque.
+    def push_back(self, value):
+        if self._right == DEQUE_BLOCK_SIZE - 1:
+            self._back.next = DequeBlock(prev=self._back)
+            self._back = self._back.next
+            self._right = -1
+        self._right += 1
+        self._back.values[self._right] = value
+        self._size += 1
+
+    #Appends the given element at the start of the deque.
+    def push_front(self, value):
+        if self._left == 0:
+            self._front.prev = DequeBlock(next=self._front)
+            self._front = self._front.prev
+            self._left = DEQUE_BLOCK_SIZE
+        self._left -= 1
+        self._front.values[self._left] = value
+        self._size += 1
+
+    #Removes the element at the given index if the deque is not empty.
+    #The values on the side nearest to the index are moved to fill the gap.
+    #Complexity: O(min(i, n - i) + n/B)
+    def remove_at(self, index):
+        if self.empty():
+            return
+        index %= self._size #Python-style indexing.
+        if index < self._size - index:
+            if index > 0:
+                self._shift(1, self.front(), index, True)
+            self.pop_front()
+        else:
+            if index < self._size - 1:
+                self._shift(self._size - 2, self.back(), self._size - 1 - index, False)
+            self.pop_back()
+
+    #Removes the given element from the deque if it is present.
+    #By default, only the first occurence of the element is removed,
+    #but "n" occurences can removed be setting the parameter "count" to "n".
+    #All the occurences of the given element can also be removed at once
+    #by setting the parameter "all" to True.
+    #Complexity: O(n)
+    def remove(self, value, count=1, all=False):
+        kept = []
+        found_count = 0
+        for current in self:
+            if current == value and (all or found_count < count):
+                found_count += 1
+            else:
+                kept.append(current)
+        if found_count > 0:
+            self.clear()
+            self.extend(kept)
+
+    #Returns the number of elements present in the deque.
+    def size(self):
+        return self._size
+
+
+
 #------------------------------------Queue-------------------------------------
 
-#Queue implemented using a linked list.
+#Queue implemented using a block deque.
 class Queue:
     def __init__(self):
-        self._lst = DoublyLinkedList()
+        self._lst = BlockDeque()
 
     #Return the number of elements present in the queue.
     def __len__(self):
@@ -565,10 +1438,10 @@ class Queue:
 
 #------------------------------------Stack-------------------------------------
 
-#Stack implemented using a linked list.
+#Stack implemented using a block deque.
 class Stack:
     def __init__(self):
-        self._lst = DoublyLinkedList()
+        self._lst = BlockDeque()
 
     #Return the number of elements present in the stack.
     def __len__(self):
@@ -608,79 +1481,139 @@ class Stack:
 
 #--------------------------------Min-max stack---------------------------------
 
-#Class used to represent a node in a min-max stack.
-class MinMaxNode:
-    def __init__(self, value, next = None, min_so_far = None, max_so_far = None):
-        self.value = value
-        self.next = next
-        self.min_so_far = min_so_far
-        self.max_so_far = max_so_far
-
-
 #Stack data structure which can also return the minimum and the maximum value.
+#Implemented using three parallel arrays (values, minimums and maximums so far)
+#instead of one node per value. A typecode can be given to store numeric
+#values in typed arrays (e.g. 'd' for floats), using 24 bytes per value.
 #Push: O(1)   Pop: O(1)   Peek: O(1)   Min: O(1)   Max: O(1)
 class MinMaxStack:
-    def __init__(self):
-        self._top = None
-        self._min_node = None
-        self._max_node = None
-        self._size = 0
+    def __init__(self, typecode = None):
+        self._values = array.array(typecode) if typecode else []
+        self._mins = array.array(typecode) if typecode else []
+        self._maxs = array.array(typecode) if typecode else []
 
     #Return the number of elements present in the stack.
     def __len__(self):
         return self.size()
 
+    #Removes every entry in the stack.
+    def clear(self):
+        del self._values[:]
+        del self._mins[:]
+        del self._maxs[:]
+
     #Returns sa boolean indicating if the stack is empty.
     def empty(self):
-        return self._size == 0
+        return not self._values
 
     #Returns the maximum value in the
     #stack or None if it is empty.
     def max(self):
-        return None if self.empty() else self._max_node.value
+        return self._maxs[-1] if self._values else None
 
     #Returns the minimum value in the
     #stack or None if it is empty.
     def min(self):
-       return None if self.empty() else self._min_node.value
+        return self._mins[-1] if self._values else None
 
     #Returns the value of the element at the
     #top of the stack or None if it is empty.
     def peek(self):
-        return None if self.empty() else self._top.value
+        return self._values[-1] if self._values else None
 
-    #Removes the element at the top
-    #of stack but doesn't return it.
+    #Removes the element at the top of stack and
+    #returns it (or returns None if the stack is empty).
     def pop(self):
-        if not self.empty():
-            if self._top == self._max_node:
-                self._max_node = self._max_node.max_so_far
-            if self._top == self._min_node:
-                self._min_node = self._min_node.min_so_far
-            self._top = self._top.next
-            self._size -= 1
+        if not self._values:
+            return None
+        self._mins.pop()
+        self._maxs.pop()
+        return self._values.pop()
 
     #Pushes the given element on the top of the stack.
     def push(self, value):
-        new_node = MinMaxNode(value)
-        if self.empty():
-            self._top = new_node
-            self._min_node = new_node
-            self._max_node = new_node
+        if self._values:
+            self._mins.append(min(value, self._mins[-1]))
+            self._maxs.append(max(value, self._maxs[-1]))
         else:
-            new_node.min_so_far = self._min_node
-            new_node.max_so_far = self._max_node
-            new_node.next = self._top
-            self._top = new_node
-            if value <= self._min_node.value:
-                self._min_node = new_node
-            if value >= self._max_node.value:
-                self._max_node = new_node
-        self._size += 1
+            self._mins.append(value)
+            self._maxs.append(value)
+        self._values.append(value)
+
+    #Pushes the given elements on the stack (the last one ending up on top).
+    #Complexity: O(n)
+    def push_many(self, values):
+        values = list(values)
+        if not values:
+            return
+        minimum = self._mins[-1] if self._values else values[0]
+        maximum = self._maxs[-1] if self._values else values[0]
+        mins = []
+        maxs = []
+        for value in values:
+            if value < minimum:
+                minimum = value
+            if value > maximum:
+                maximum = value
+            mins.append(minimum)
+            maxs.append(maximum)
+        self._values.extend(values)
+        self._mins.extend(mins)
+        self._maxs.extend(maxs)
 
     #Returns the number of elements present in the stack.
     def size(self):
-        return self._size
+        return len(self._values)
+
+
+#Min-max stack which only records the minimum (maximum) when a value
+#smaller (greater) or equal to the current one is pushed, which uses
+#close to the memory of the values alone when they rarely change.
+#Push: O(1)   Pop: O(1)   Peek: O(1)   Min: O(1)   Max: O(1)
+class SparseMinMaxStack(MinMaxStack):
+    #Removes the element at the top of stack and
+    #returns it (or returns None if the stack is empty).
+    def pop(self):
+        if not self._values:
+            return None
+        value = self._values.pop()
+        if value == self._mins[-1]:
+            self._mins.pop()
+        if value == self._maxs[-1]:
+            self._maxs.pop()
+        return value
+
+    #Pushes the given element on the top of the stack.
+    def push(self, value):
+        if not self._values or value <= self._mins[-1]:
+            self._mins.append(value)
+        if not self._values or value >= self._maxs[-1]:
+            self._maxs.append(value)
+        self._values.append(value)
+
+    #Pushes the given elements on the stack (the last one ending up on top).
+    #Complexity: O(n)
+    def push_many(self, values):
+        values = list(values)
+        if not values:
+            return
+        if not self._values:
+            self.push(values[0])
+            values = values[1:]
+        minimum = self._mins[-1]
+        maximum = self._maxs[-1]
+        mins = []
+        maxs = []
+        for value in values:
+            if value <= minimum:
+                minimum = value
+                mins.append(value)
+            if value >= maximum:
+                maximum = value
+                maxs.append(value)
+        self._values.extend(values)
+        self._mins.extend(mins)
+        self._maxs.extend(maxs)
 
 
 
@@ -690,9 +1623,9 @@ class MinMaxStack:
 #the maximum value, implemented using two min-max stacks.
 #Push: O(1)   Pop: O(1)   Front: O(1)   Min: O(1)   Max: O(1)
 class MinMaxQueue:
-    def __init__(self):
-        self._push_stack = MinMaxStack()
-        self._pop_stack = MinMaxStack()
+    def __init__(self, typecode = None, stack_type = MinMaxStack):
+        self._push_stack = stack_type(typecode)
+        self._pop_stack = stack_type(typecode)
 
     #Return the number of elements present in the queue.
     def __len__(self):
@@ -747,19 +1680,1218 @@ class MinMaxQueue:
     def size(self):
         return self._push_stack.size() + self._pop_stack.size()
 
+    #Moves the values of the push stack onto the pop stack in one bulk push.
     def _transfer_push_stack(self):
-        if not self.empty():
-            while not self._push_stack.empty():
-                self._pop_stack.push(self._push_stack.peek())
-                self._push_stack.pop()
-            
+        if not self._push_stack.empty():
+            self._pop_stack.push_many(reversed(self._push_stack._values))
+            self._push_stack.clear()
+
+
+
+#------------------------------Sliding window----------------------------------
+
+#Queue which can return the aggregate of its values for any associative operation
+#(sum, min, max, gcd, argmax on (value, index) tuples, custom monoid...), given as a
+#function taking two values. Implemented using two array-backed stacks: the values
+#pushed at the back only update a running aggregate, while the front stack stores
+#the aggregate of each of its values with the ones above it. When the front stack
+#is empty, the back stack is flipped onto it in one pass. The operation doesn't
+#need to be commutative. A typecode can be given to store numeric values and
+#aggregates in typed arrays instead of lists.
+#Push: O(1)   Pop: O(1) amortized   Front: O(1)   Aggregate: O(1)
+class SlidingWindowAggregator:
+    def __init__(self, op, typecode = None):
+        self._op = op
+        self._front_values = array.array(typecode) if typecode else []
+        self._front_aggregates = array.array(typecode) if typecode else []
+        self._back_values = array.array(typecode) if typecode else []
+        self._back_aggregate = None
+
+    #Return the number of elements present in the window.
+    def __len__(self):
+        return self.size()
+
+    #Moves the values of the back stack onto the front stack.
+    #Complexity: O(n)
+    def _flip(self):
+        op = self._op
+        values = self._back_values
+        aggregates = self._front_aggregates
+        self._front_values.extend(reversed(values))
+        aggregate = values[-1]
+        aggregates.append(aggregate)
+        for i in range(len(values) - 2, -1, -1):
+            aggregate = op(values[i], aggregate)
+            aggregates.append(aggregate)
+        del values[:]
+        self._back_aggregate = None
+
+    #Returns the aggregate of the values in the
+    #window or None if the window is empty.
+    def aggregate(self):
+        if not self._front_aggregates:
+            return self._back_aggregate
+        if not self._back_values:
+            return self._front_aggregates[-1]
+        return self._op(self._front_aggregates[-1], self._back_aggregate)
+
+    #Returns the value of the last element in
+    #the window or None if it is empty.
+    def back(self):
+        if self._back_values:
+            return self._back_values[-1]
+        return self._front_values[0] if self._front_values else None
+
+    #Removes every entry in the window.
+    def clear(self):
+        del self._front_values[:]
+        del self._front_aggregates[:]
+        del self._back_values[:]
+        self._back_aggregate = None
+
+    #Returns a boolean indicating if the window is empty.
+    def empty(self):
+        return not self._front_values and not self._back_values
+
+    #Returns the value of the first element in
+    #the window or None if it is empty.
+    def front(self):
+        if self._front_values:
+            return self._front_values[-1]
+        return self._back_values[0] if self._back_values else None
+
+    #Removes the first element of the window and returns it
+    #(or returns None if the window is empty).
+    def pop(self):
+        if not self._front_values:
+            if not self._back_values:
+                return None
+            self._flip()
+        self._front_aggregates.pop()
+        return self._front_values.pop()
+
+    #Appends the given element at the back of the window.
+    def push(self, value):
+        if self._back_values:
+            self._back_aggregate = self._op(self._back_aggregate, value)
+        else:
+            self._back_aggregate = value
+        self._back_values.append(value)
+
+    #Returns the number of elements present in the window.
+    def size(self):
+        return len(self._front_values) + len(self._back_values)
+
+
+#Generator yielding the aggregate (for the given associative operation)
+#of every window of the given size over the values of the iterable.
+#By default, only full windows are considered, but the aggregates of the
+#first windows can also be yielded by setting "partial" to True.
+#Complexity: O(n) (one push and one pop per value)
+def window_stream(iterable, size, op, partial = False, typecode = None):
+    window = SlidingWindowAggregator(op, typecode)
+    push = window.push
+    pop = window.pop
+    aggregate = window.aggregate
+    count = 0
+    for value in iterable:
+        push(value)
+        if count == size:
+            pop()
+        else:
+            count += 1
+        if partial or count == size:
+            yield aggregate()
+
+
+
+#----------------------------------Caches--------------------------------------
+
+#Class used to represent an entry in a cache (a node of one of its linked lists).
+class CacheNode(ListNode):
+    def __init__(self, key, value, nbytes = 0):
+        super().__init__(value)
+        self.key = key
+        self.nbytes = nbytes
+        self.frequency = 1
+        self.expires = None
+
+
+#Base class of the caches, which map keys to values and evict entries once
+#they hold more than "capacity" entries or (if max_bytes is set) once the
+#sizes of their keys and values, as given by the "sizeof" function, exceed
+#max_bytes. By default, the least recently used entry is evicted (the entries
+#are kept in that order in a doubly linked list); the subclasses change the
+#policy by overriding _attach(), _detach(), _touch() and _victim(). The number
+#of hits, misses and evictions are counted (expired entries count as evictions).
+#Get: O(1)   Put: O(1)   Remove: O(1)
+class Cache:
+    def __init__(self, capacity = 128, max_bytes = None, sizeof = sys.getsizeof):
+        self._lst = DoublyLinkedList()
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._nodes = {}
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    #Returns a boolean indicating if the given key is in the cache
+    #(without counting it as a hit or a miss).
+    def __contains__(self, key):
+        node = self._nodes.get(key)
+        return node is not None and not self._expired(node)
+
+    #Returns the value of the given key, raising a KeyError if it isn't cached.
+    def __getitem__(self, key):
+        node = self._lookup(key)
+        if node is None:
+            raise KeyError(key)
+        return node.value
+
+    #Return the number of entries in the cache.
+    def __len__(self):
+        return self.size()
+
+    #Caches the given value for the given key.
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    #Removes the given key, raising a KeyError if it isn't cached.
+    def __delitem__(self, key):
+        if not self.remove(key):
+            raise KeyError(key)
+
+    #Returns a boolean indicating if the given entry expired.
+    def _expired(self, node):
+        return False
+
+    #Returns the entry of the given key (or None if it isn't cached)
+    #and updates the counters and the eviction policy.
+    def _lookup(self, key):
+        node = self._nodes.get(key)
+        if node is not None and self._expired(node):
+            self._unlink(node)
+            self.evictions += 1
+            node = None
+        if node is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(node)
+        return node
+
+    #Returns a boolean indicating if the cache can't take a new entry of the given size.
+    def _full(self, nbytes):
+        if self.capacity is not None and len(self._nodes) >= self.capacity:
+            return True
+        return self.max_bytes is not None and self._nbytes + nbytes > self.max_bytes
+
+    #Evicts entries until a new entry of the given size fits in the budget.
+    def _make_room(self, nbytes):
+        while self._nodes and self._full(nbytes):
+            self._unlink(self._victim())
+            self.evictions += 1
+
+    #Removes the given entry from the cache.
+    def _unlink(self, node):
+        del self._nodes[node.key]
+        self._nbytes -= node.nbytes
+        self._detach(node)
+
+    #Adds the given (new) entry to the eviction policy
+    #(new entries are the most recently used ones).
+    def _attach(self, node):
+        self._lst._push_node_back(node)
+
+    #Removes the given entry from the eviction policy.
+    def _detach(self, node):
+        self._lst._remove_node(node)
+
+    #Updates the eviction policy when the given entry is accessed
+    #(moves it to the back of the list, as the most recently used).
+    def _touch(self, node):
+        self._lst._remove_node(node)
+        self._lst._push_node_back(node)
+
+    #Returns the entry which should be evicted next
+    #(the least recently used one is at the front of the list).
+    def _victim(self):
+        return self._lst._front
+
+    #Returns the number of bytes used by the keys and values
+    #(only tracked when the cache has a byte budget).
+    def bytes(self):
+        return self._nbytes
+
+    #Removes every entry in the cache (the counters are kept).
+    def clear(self):
+        for node in list(self._nodes.values()):
+            self._unlink(node)
+
+    #Returns a boolean indicating if the cache is empty.
+    def empty(self):
+        return self.size() == 0
+
+    #Returns the value of the given key or the given
+    #default value (None by default) if it isn't cached.
+    def get(self, key, default = None):
+        node = self._lookup(key)
+        return default if node is None else node.value
+
+    #Returns the ratio of hits among the lookups (0 if there was none).
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return 0 if lookups == 0 else self.hits / lookups
+
+    #Caches the given value for the given key, evicting other entries beforehand
+    #if needed. Updating a key keeps its entry (and its frequency of use).
+    #A value larger than the whole byte budget is not kept.
+    def put(self, key, value):
+        nbytes = self._sizeof(key) + self._sizeof(value) if self.max_bytes is not None else 0
+        node = self._nodes.get(key)
+        if node is None:
+            node = CacheNode(key, value, nbytes)
+        else:
+            self._unlink(node)
+        if self.capacity == 0 or (self.max_bytes is not None and nbytes > self.max_bytes):
+            return
+        node.value = value
+        node.nbytes = nbytes
+        self._make_room(nbytes)
+        self._nodes[key] = node
+        self._nbytes += nbytes
+        self._attach(node)
+
+    #Removes the given key from the cache. Returns
+    #a boolean indicating if the key was cached.
+    def remove(self, key):
+        node = self._nodes.get(key)
+        if node is None:
+            return False
+        self._unlink(node)
+        return True
+
+    #Returns the number of entries in the cache.
+    def size(self):
+        return len(self._nodes)
+
+    #Returns a dictionary containing the counters of the cache.
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': self.size(), 'bytes': self._nbytes}
+
+
+#Cache evicting the least recently used entry (the default policy of Cache).
+class LRUCache(Cache):
+    pass
+
+
+#Cache evicting the least frequently used entry (the least recently used one
+#among them). The entries are kept in one doubly linked list per frequency, so
+#that every operation is O(1).
+class LFUCache(Cache):
+    def __init__(self, capacity = 128, max_bytes = None, sizeof = sys.getsizeof):
+        super().__init__(capacity, max_bytes, sizeof)
+        self._buckets = {}
+        self._min_frequency = 0
+
+    #Appends the entry to the list of its frequency.
+    def _attach(self, node):
+        bucket = self._buckets.get(node.frequency)
+        if bucket is None:
+            bucket = self._buckets[node.frequency] = DoublyLinkedList()
+        bucket._push_node_back(node)
+        if len(self._nodes) == 1 or node.frequency < self._min_frequency:
+            self._min_frequency = node.frequency
+
+    #Unlinks the entry from the list of its frequency (deleting the list if it is now empty).
+    def _detach(self, node):
+        bucket = self._buckets[node.frequency]
+        bucket._remove_node(node)
+        if bucket.empty():
+            del self._buckets[node.frequency]
+
+    #Moves the entry to the list of the next frequency.
+    def _touch(self, node):
+        self._detach(node)
+        if node.frequency == self._min_frequency and node.frequency not in self._buckets:
+            self._min_frequency += 1
+        node.frequency += 1
+        self._attach(node)
+
+    #The entry to evict is at the front of the list of the lowest frequency.
+    def _victim(self):
+        if self._min_frequency not in self._buckets:
+            self._min_frequency = min(self._buckets) #Only after explicit removals.
+        return self._buckets[self._min_frequency]._front
+
+
+#Cache whose entries expire "ttl" time units (seconds with the default clock)
+#after being put. The clock can be any function returning the current time.
+#When the cache is full, the entry closest to expiring is evicted. The entries
+#are kept in a doubly linked list in the order they were put (which is also the
+#order they expire in), and the expired ones are purged every time a value is put.
+class TTLCache(Cache):
+    def __init__(self, ttl, capacity = 128, max_bytes = None, sizeof = sys.getsizeof, clock = time.monotonic):
+        super().__init__(capacity, max_bytes, sizeof)
+        self.ttl = ttl
+        self._clock = clock
+
+    #Returns a boolean indicating if the given entry expired.
+    def _expired(self, node):
+        return self._clock() >= node.expires
+
+    #Sets the expiration time of the entry and appends it to the list.
+    def _attach(self, node):
+        node.expires = self._clock() + self.ttl
+        super()._attach(node)
+
+    #Accessing an entry doesn't change its expiration time.
+    def _touch(self, node):
+        pass
+
+    #Removes the expired entries. Returns the number of entries removed.
+    #Complexity: O(number of expired entries)
+    def expire(self):
+        now = self._clock()
+        count = 0
+        while not self._lst.empty() and now >= self._lst._front.expires:
+            self._unlink(self._lst._front)
+            count += 1
+        self.evictions += count
+        return count
+
+    #Caches the given value for the given key,
+    #purging the expired entries beforehand.
+    def put(self, key, value):
+        self.expire()
+        super().put(key, value)
+
+
+#Decorator caching the results of a function in the given cache (a new
+#LRUCache by default), keyed by its arguments (which must be hashable).
+#The cache is available as the "cache" attribute of the decorated function.
+#Usage: @memoize() or @memoize(LFUCache(1024))
+def memoize(cache = None):
+    if cache is None:
+        cache = LRUCache()
+    missing = object()
+    keyword_mark = object() #Separates the positional and keyword arguments in the keys.
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = args
+            if kwargs:
+                key += (keyword_mark,) + tuple(item for pair in sorted(kwargs.items()) for item in pair)
+            result = cache.get(key, missing)
+            if result is missing:
+                result = function(*args, **kwargs)
+                cache.put(key, result)
+            return result
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+
+#---------------------------------Skip list------------------------------------
+
+#Maximum number of levels of a skip list (enough for 4^16 keys).
+SKIP_LIST_MAX_LEVEL = 16
+
+#Probability that a node of a skip list is promoted to the next level.
+SKIP_LIST_P = 0.25
+
+
+#Class used to represent a node in a skip list. width[i] is the number of
+#nodes skipped by the link next[i] (one more than the number of keys between
+#the two nodes), which allows finding keys by index.
+class SkipListNode:
+    __slots__ = ('key', 'value', 'next', 'width')
+
+    def __init__(self, key, value, level):
+        self.key = key
+        self.value = value
+        self.next = [None] * level
+        self.width = [1] * level
+
+
+#Ordered map implemented using an indexable skip list. The keys must be
+#comparable with each other. Iterating over the map yields its keys in order.
+#Insert: O(log n)   Remove: O(log n)   Search: O(log n)   Rank/Select: O(log n)
+#(expected complexities)
+class SortedMap:
+    def __init__(self, items = None):
+        self.clear()
+        for key, value in (items or ()):
+            self.insert(key, value)
+
+    #Returns a boolean indicating if the given key is in the map.
+    def __contains__(self, key):
+        return self.contains(key)
+
+    #Removes the given key, raising a KeyError if it isn't in the map.
+    def __delitem__(self, key):
+        if not self.remove(key):
+            raise KeyError(key)
+
+    #Returns the value of the given key, raising a KeyError if it isn't in the map.
+    def __getitem__(self, key):
+        node = self._find(key)
+        if node is None:
+            raise KeyError(key)
+        return node.value
+
+    #Iterates over the keys of the map in order.
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    #Returns the number of keys in the map.
+    def __len__(self):
+        return self._size
+
+    #Sets the value of the given key.
+    def __setitem__(self, key, value):
+        self.insert(key, value)
+
+    #Builds and returns the string representing the map.
+    def __str__(self):
+        return '{' + ', '.join(str(key) + ': ' + str(value) for key, value in self.items()) + '}'
+
+    #Returns the node of the given key or None if it isn't in the map.
+    def _find(self, key):
+        node = self._head
+        for level in range(self._level - 1, -1, -1):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+        node = node.next[0]
+        return node if node is not None and node.key == key else None
+
+    #Returns the last node before the given key on every level
+    #and the index (1-based, the head being 0) of each of them.
+    def _find_path(self, key):
+        path = [self._head] * SKIP_LIST_MAX_LEVEL
+        ranks = [0] * SKIP_LIST_MAX_LEVEL
+        node = self._head
+        rank = 0
+        for level in range(self._level - 1, -1, -1):
+            while node.next[level] is not None and node.next[level].key < key:
+                rank += node.width[level]
+                node = node.next[level]
+            path[level] = node
+            ranks[level] = rank
+        return path, ranks
+
+    #Returns the node at the given (positive) index.
+    def _node_at(self, index):
+        position = index + 1
+        node = self._head
+        for level in range(self._level - 1, -1, -1):
+            while node.next[level] is not None and node.width[level] <= position:
+                position -= node.width[level]
+                node = node.next[level]
+        return node
+
+    #Returns a random level for a new node.
+    def _random_level(self):
+        level = 1
+        while level < SKIP_LIST_MAX_LEVEL and random.random() < SKIP_LIST_P:
+            level += 1
+        return level
+
+    #Returns the key which is the closest one greater or equal
+    #to the given key or None if there is no such key.
+    def ceiling(self, key):
+        path, _ = self._find_path(key)
+        node = path[0].next[0]
+        return None if node is None else node.key
+
+    #Removes every key in the map.
+    def clear(self):
+        self._head = SkipListNode(None, None, SKIP_LIST_MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    #Returns a boolean indicating if the given key is in the map.
+    def contains(self, key):
+        return self._find(key) is not None
+
+    #Returns a boolean indicating if the map is empty.
+    def empty(self):
+        return self._size == 0
+
+    #Returns the key which is the closest one smaller or equal
+    #to the given key or None if there is no such key.
+    def floor(self, key):
+        path, _ = self._find_path(key)
+        node = path[0].next[0]
+        if node is not None and node.key == key:
+            return key
+        return None if path[0] is self._head else path[0].key
+
+    #Returns the value of the given key or the given
+    #default value (None by default) if it isn't in the map.
+    def get(self, key, default = None):
+        node = self._find(key)
+        return default if node is None else node.value
+
+    #Inserts the given key with the given value
+    #(replacing the value if the key is already present).
+    def insert(self, key, value = None):
+        path, ranks = self._find_path(key)
+        node = path[0].next[0]
+        if node is not None and node.key == key:
+            node.value = value
+            return
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                self._head.width[i] = self._size + 1
+            self._level = level
+        node = SkipListNode(key, value, level)
+        rank = ranks[0]
+        for i in range(level):
+            prev = path[i]
+            node.next[i] = prev.next[i]
+            prev.next[i] = node
+            node.width[i] = prev.width[i] - (rank - ranks[i])
+            prev.width[i] = rank - ranks[i] + 1
+        for i in range(level, self._level):
+            path[i].width[i] += 1
+        self._size += 1
+
+    #Iterates over the (key, value) pairs of the map in order.
+    def items(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key, node.value
+            node = node.next[0]
+
+    #Returns the largest key in the map or None if it is empty.
+    def max(self):
+        return None if self.empty() else self._node_at(self._size - 1).key
+
+    #Returns the smallest key in the map or None if it is empty.
+    def min(self):
+        node = self._head.next[0]
+        return None if node is None else node.key
+
+    #Iterates over the (key, value) pairs whose key is in
+    #[lo, hi[ in order (lo and hi are unbounded when None).
+    def range(self, lo = None, hi = None):
+        if lo is None:
+            node = self._head.next[0]
+        else:
+            path, _ = self._find_path(lo)
+            node = path[0].next[0]
+        while node is not None and (hi is None or node.key < hi):
+            yield node.key, node.value
+            node = node.next[0]
+
+    #Returns the number of keys smaller than the given key
+    #(its index in the map if the key is present).
+    def rank(self, key):
+        _, ranks = self._find_path(key)
+        return ranks[0]
+
+    #Removes the given key from the map. Returns
+    #a boolean indicating if the key was present.
+    def remove(self, key):
+        path, _ = self._find_path(key)
+        node = path[0].next[0]
+        if node is None or node.key != key:
+            return False
+        for i in range(self._level):
+            prev = path[i]
+            if prev.next[i] is node:
+                prev.width[i] += node.width[i] - 1
+                prev.next[i] = node.next[i]
+            else:
+                prev.width[i] -= 1
+        self._size -= 1
+        return True
+
+    #Returns the key at the given index (Python-style
+    #indexing), raising an IndexError if it is out of range.
+    def select(self, index):
+        if not -self._size <= index < self._size:
+            raise IndexError('SortedMap index out of range')
+        return self._node_at(index % self._size).key
+
+    #Returns the number of keys in the map.
+    def size(self):
+        return self._size
+
+    #Builds a map from (key, value) pairs sorted by key in O(n) by linking the
+    #nodes level by level instead of searching for each insertion point.
+    #When a key is repeated, the last value is kept.
+    @classmethod
+    def from_sorted(cls, items):
+        result = cls()
+        head = result._head
+        last = [head] * SKIP_LIST_MAX_LEVEL
+        last_ranks = [0] * SKIP_LIST_MAX_LEVEL
+        rank = 0
+        for key, value in items:
+            if rank > 0 and last[0].key == key:
+                last[0].value = value
+                continue
+            rank += 1
+            level = result._random_level()
+            node = SkipListNode(key, value, level)
+            for i in range(level):
+                last[i].next[i] = node
+                last[i].width[i] = rank - last_ranks[i]
+                last[i] = node
+                last_ranks[i] = rank
+            result._level = max(result._level, level)
+        for i in range(SKIP_LIST_MAX_LEVEL):
+            last[i].width[i] = rank + 1 - last_ranks[i]
+        result._size = rank
+        return result
+
+
+#Ordered set implemented using a SortedMap (with None values).
+#Add: O(log n)   Remove: O(log n)   Contains: O(log n)   Rank/Select: O(log n)
+#(expected complexities)
+class SortedSet:
+    def __init__(self, keys = None):
+        self._map = SortedMap()
+        for key in (keys or ()):
+            self._map.insert(key)
+
+    #Returns a boolean indicating if the given key is in the set.
+    def __contains__(self, key):
+        return self._map.contains(key)
+
+    #Iterates over the keys of the set in order.
+    def __iter__(self):
+        return iter(self._map)
+
+    #Returns the number of keys in the set.
+    def __len__(self):
+        return len(self._map)
+
+    #Builds and returns the string representing the set.
+    def __str__(self):
+        return '{' + ', '.join(str(key) for key in self._map) + '}'
+
+    #Adds the given key to the set.
+    def add(self, key):
+        self._map.insert(key)
+
+    #Returns the key which is the closest one greater or equal
+    #to the given key or None if there is no such key.
+    def ceiling(self, key):
+        return self._map.ceiling(key)
+
+    #Removes every key in the set.
+    def clear(self):
+        self._map.clear()
+
+    #Returns a boolean indicating if the given key is in the set.
+    def contains(self, key):
+        return self._map.contains(key)
+
+    #Returns a boolean indicating if the set is empty.
+    def empty(self):
+        return self._map.empty()
 
+    #Returns the key which is the closest one smaller or equal
+    #to the given key or None if there is no such key.
+    def floor(self, key):
+        return self._map.floor(key)
 
+    #Returns the largest key in the set or None if it is empty.
+    def max(self):
+        return self._map.max()
+
+    #Returns the smallest key in the set or None if it is empty.
+    def min(self):
+        return self._map.min()
+
+    #Iterates over the keys in [lo, hi[ in order
+    #(lo and hi are unbounded when None).
+    def range(self, lo = None, hi = None):
+        for key, _ in self._map.range(lo, hi):
+            yield key
+
+    #Returns the number of keys smaller than the given key.
+    def rank(self, key):
+        return self._map.rank(key)
+
+    #Removes the given key from the set. Returns
+    #a boolean indicating if the key was present.
+    def remove(self, key):
+        return self._map.remove(key)
+
+    #Returns the key at the given index (Python-style
+    #indexing), raising an IndexError if it is out of range.
+    def select(self, index):
+        return self._map.select(index)
+
+    #Returns the number of keys in the set.
+    def size(self):
+        return self._map.size()
+
+    #Builds a set from sorted keys in O(n).
+    @classmethod
+    def from_sorted(cls, keys):
+        result = cls()
+        result._map = SortedMap.from_sorted((key, None) for key in keys)
+        return result
+
+
+
+#--------------------------------Ring buffer-----------------------------------
+
+#Fixed-capacity FIFO buffer of numbers stored contiguously in an array of the
+#given typecode (or in a bytearray when typecode is None). When the buffer is
+#full, pushing either overwrites the oldest values (overwrite = True) or blocks
+#until a consumer frees some space (overwrite = False), raising queue.Full when
+#not blocking or once the timeout expires. The values can be read without being
+#copied through the memoryview segments returned by segments() and then be
+#discarded with consume(). The buffer is thread-safe.
+#Push: O(1)   Pop: O(1)   Extend: O(k)   Segments: O(1)
+class RingBuffer:
+    def __init__(self, capacity, typecode = 'd', overwrite = True):
+        if capacity <= 0:
+            raise ValueError('RingBuffer capacity must be positive')
+        if typecode is None:
+            self._buffer = bytearray(capacity)
+        else:
+            self._buffer = array.array(typecode, bytes(capacity * array.array(typecode).itemsize))
+        self._view = memoryview(self._buffer)
+        self._typecode = typecode
+        self._capacity = capacity
+        self._overwrite = overwrite
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+
+    #Returns the value at the given index (0 being the oldest value,
+    #Python-style indexing), raising an IndexError if it is out of range.
+    def __getitem__(self, index):
+        with self._lock:
+            if not -self._size <= index < self._size:
+                raise IndexError('RingBuffer index out of range')
+            return self._buffer[(self._start + index % self._size) % self._capacity]
+
+    #Iterates over a snapshot of the values from the oldest to the newest.
+    def __iter__(self):
+        return iter(self.to_list())
+
+    #Returns the number of values in the buffer.
+    def __len__(self):
+        return self._size
+
+    #Returns the kind of the values of the given buffer format ('i' for signed
+    #integers, 'u' for unsigned integers, 'f' for floats) or None if they
+    #aren't numbers in the native byte order.
+    @staticmethod
+    def _format_kind(fmt):
+        if fmt[:1] in ('@', '=', '<' if sys.byteorder == 'little' else '>'):
+            fmt = fmt[1:]
+        if len(fmt) != 1:
+            return None
+        if fmt in 'bhilqn':
+            return 'i'
+        if fmt in 'BHILQN':
+            return 'u'
+        return 'f' if fmt in 'efd' else None
+
+    #Returns a memoryview of the given values with the format of the buffer.
+    #Contiguous buffers holding the same kind and size of numbers (e.g. NumPy
+    #arrays) are used without being copied, the other values are converted
+    #(raising a TypeError if they can't be).
+    def _as_view(self, values):
+        try:
+            view = memoryview(values)
+        except TypeError:
+            view = None
+        if view is not None:
+            kind = self._format_kind(view.format)
+            if (view.c_contiguous and kind is not None and kind == self._format_kind(self._view.format)
+                    and view.itemsize == self._view.itemsize):
+                return view.cast('B').cast(self._view.format) #Flattened, with the buffer's format.
+            values = [field for fields in struct.iter_unpack(view.format, view.tobytes()) for field in fields]
+        return memoryview(bytearray(values) if self._typecode is None else array.array(self._typecode, values))
+
+    #Returns the slices of the buffer holding the "count" oldest values.
+    def _segments(self, count):
+        end = self._start + count
+        if end <= self._capacity:
+            return (self._view[self._start:end],)
+        return (self._view[self._start:], self._view[:end - self._capacity])
+
+    #Copies the given values after the newest value (there must be enough space).
+    def _write(self, view):
+        count = len(view)
+        begin = (self._start + self._size) % self._capacity
+        first = min(count, self._capacity - begin)
+        self._view[begin:begin + first] = view[:first]
+        if first < count:
+            self._view[:count - first] = view[first:]
+        self._size += count
+
+    #Waits until there is free space in the buffer (when it isn't in overwrite mode).
+    def _wait_for_space(self, block, deadline):
+        if self._size < self._capacity:
+            return
+        if not block:
+            raise queue.Full
+        predicate = lambda: self._size < self._capacity
+        if deadline is None:
+            self._not_full.wait_for(predicate)
+        elif not self._not_full.wait_for(predicate, deadline - time.monotonic()):
+            raise queue.Full
+
+    #Returns the maximum number of values the buffer can hold.
+    def capacity(self):
+        return self._capacity
+
+    #Removes every value in the buffer.
+    def clear(self):
+        with self._not_full:
+            self._start = 0
+            self._size = 0
+            self._not_full.notify_all()
+
+    #Discards the "count" oldest values (all of them by default), typically
+    #after reading them through segments(). Returns the number discarded.
+    def consume(self, count = None):
+        with self._not_full:
+            count = self._size if count is None else min(count, self._size)
+            self._start = (self._start + count) % self._capacity
+            self._size -= count
+            self._not_full.notify_all()
+            return count
+
+    #Returns a boolean indicating if the buffer is empty.
+    def empty(self):
+        return self._size == 0
 
+    #Appends the given values, which can be any iterable of numbers or an object
+    #supporting the buffer protocol (copied without converting each value).
+    #Raises queue.Full (after inserting the first values) if the buffer
+    #doesn't have enough free space before the timeout expires.
+    def extend(self, values, block = True, timeout = None):
+        view = self._as_view(values)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._not_full:
+            if self._overwrite:
+                if len(view) >= self._capacity:
+                    self._start = 0
+                    self._size = 0
+                    view = view[len(view) - self._capacity:]
+                overflow = self._size + len(view) - self._capacity
+                if overflow > 0:
+                    self._start = (self._start + overflow) % self._capacity
+                    self._size -= overflow
+                self._write(view)
+                return
+            while len(view) > 0:
+                self._wait_for_space(block, deadline)
+                count = min(len(view), self._capacity - self._size)
+                self._write(view[:count])
+                view = view[count:]
+
+    #Returns a boolean indicating if the buffer is full.
+    def full(self):
+        return self._size == self._capacity
+
+    #Returns the oldest value without removing
+    #it or None if the buffer is empty.
+    def peek(self):
+        with self._lock:
+            return self._buffer[self._start] if self._size > 0 else None
 
+    #Removes the oldest value and returns it (or
+    #returns None if the buffer is empty).
+    def pop(self):
+        with self._not_full:
+            if self._size == 0:
+                return None
+            value = self._buffer[self._start]
+            self._start = (self._start + 1) % self._capacity
+            self._size -= 1
+            self._not_full.notify()
+            return value
+
+    #Appends the given value (see the class comment for a full buffer).
+    def push(self, value, block = True, timeout = None):
+        with self._not_full:
+            if self._size == self._capacity and self._overwrite:
+                self._start = (self._start + 1) % self._capacity
+                self._size -= 1
+            else:
+                self._wait_for_space(block, None if timeout is None else time.monotonic() + timeout)
+            self._buffer[(self._start + self._size) % self._capacity] = value
+            self._size += 1
+
+    #Returns one memoryview (or two when the values wrap around the end of the
+    #storage) over the "count" oldest values (all of them by default), in order.
+    #The views share the buffer's memory: they must be used before the values
+    #are consumed and overwritten.
+    def segments(self, count = None):
+        with self._lock:
+            count = self._size if count is None else min(count, self._size)
+            return self._segments(count)
+
+    #Returns the number of values in the buffer.
+    def size(self):
+        return self._size
 
+    #Returns a list containing a copy of the values from the oldest to the newest.
+    def to_list(self):
+        with self._lock:
+            result = []
+            for segment in self._segments(self._size):
+                result.extend(segment.tolist())
+            return result
+
+
+
+#-------------------------------Range queries----------------------------------
+
+#Fenwick tree (binary indexed tree) over an array of numbers (zero-indexed),
+#stored in a one-indexed list (or typed array when a typecode is given).
+#Build: O(n)   Update: O(log n)   Prefix sum: O(log n)   Search: O(log n)
+class FenwickTree:
+    def __init__(self, values, typecode = None):
+        if isinstance(values, int):
+            values = [0] * values
+        tree = [0] + list(values)
+        n = len(tree) - 1
+        for i in range(1, n + 1): #Push every partial sum to its parent once.
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = array.array(typecode, tree) if typecode else tree
+        self._size = n
+
+    #Returns the value at the given index.
+    def __getitem__(self, index):
+        return self.get(index)
 
+    #Returns the number of values in the tree.
+    def __len__(self):
+        return self._size
+
+    #Sets the value at the given index.
+    def __setitem__(self, index, value):
+        self.set(index, value)
+
+    #Adds delta to the value at the given index.
+    def add(self, index, delta):
+        tree = self._tree
+        i = index + 1
+        while i <= self._size:
+            tree[i] += delta
+            i += i & -i
+
+    #Returns the value at the given index.
+    def get(self, index):
+        return self.range_sum(index, index + 1)
+
+    #Returns the smallest index i such that the sum of the values in [0, i] is
+    #greater or equal to the given target (the size of the tree if there is none).
+    #The values must not be negative. With values counting occurences, this is
+    #the index of the target-th smallest element (order statistic).
+    def lower_bound(self, target):
+        tree = self._tree
+        position = 0
+        step = 1 << self._size.bit_length()
+        while step > 0:
+            if position + step <= self._size and tree[position + step] < target:
+                position += step
+                target -= tree[position]
+            step >>= 1
+        return position
+
+    #Returns the sum of the values in [0, end[.
+    def prefix_sum(self, end):
+        tree = self._tree
+        result = 0
+        i = min(end, self._size)
+        while i > 0:
+            result += tree[i]
+            i -= i & -i
+        return result
+
+    #Returns the sum of the values in [lo, hi[.
+    def range_sum(self, lo, hi):
+        return self.prefix_sum(hi) - self.prefix_sum(lo)
+
+    #Sets the value at the given index.
+    def set(self, index, value):
+        self.add(index, value - self.get(index))
 
+    #Returns the number of values in the tree.
+    def size(self):
+        return self._size
 
 
+#Iterative segment tree over an array, aggregating ranges with any monoid given
+#as an associative function "op" and its identity element. Ranges are half-open
+#([lo, hi[). Range updates are supported with lazy propagation when an update
+#function is given: mapping(f, x, length) applies the update f to the aggregate
+#x of a segment of the given length, and composition(f, g) returns the update
+#equivalent to applying g then f. lazy_identity is the update which does nothing.
+#Build: O(n)   Query: O(log n)   Point update: O(log n)   Range update: O(log n)
+class SegmentTree:
+    def __init__(self, values, op, identity, mapping = None, composition = None, lazy_identity = None):
+        values = list(values)
+        self._n = len(values)
+        self._log = max(self._n - 1, 0).bit_length()
+        self._leaves = 1 << self._log
+        self._op = op
+        self._identity = identity
+        self._mapping = mapping
+        self._composition = composition
+        self._lazy_identity = lazy_identity
+        self._data = [identity] * (2 * self._leaves)
+        self._data[self._leaves:self._leaves + self._n] = values
+        for i in range(self._leaves - 1, 0, -1):
+            self._data[i] = op(self._data[2 * i], self._data[2 * i + 1])
+        self._lazy = None if mapping is None else [lazy_identity] * self._leaves
+
+    #Returns the value at the given index.
+    def __getitem__(self, index):
+        return self.get(index)
 
+    #Returns the number of values in the tree.
+    def __len__(self):
+        return self._n
+
+    #Sets the value at the given index.
+    def __setitem__(self, index, value):
+        self.set(index, value)
+
+    #Applies the given update to the node, storing it for its children.
+    def _apply_node(self, node, f):
+        self._data[node] = self._mapping(f, self._data[node], self._leaves >> (node.bit_length() - 1))
+        if node < self._leaves:
+            self._lazy[node] = self._composition(f, self._lazy[node])
+
+    #Pushes the pending update of the node to its children.
+    def _push(self, node):
+        f = self._lazy[node]
+        if f != self._lazy_identity:
+            self._apply_node(2 * node, f)
+            self._apply_node(2 * node + 1, f)
+            self._lazy[node] = self._lazy_identity
+
+    #Pushes the pending updates on the path from the root to the leaf.
+    def _push_path(self, leaf):
+        if self._lazy is not None:
+            for i in range(self._log, 0, -1):
+                self._push(leaf >> i)
+
+    #Pushes the pending updates above the boundaries of the range of leaves [lo, hi[.
+    def _push_range(self, lo, hi):
+        if self._lazy is not None:
+            for i in range(self._log, 0, -1):
+                if ((lo >> i) << i) != lo:
+                    self._push(lo >> i)
+                if ((hi >> i) << i) != hi:
+                    self._push((hi - 1) >> i)
+
+    #Recomputes the aggregate of the node from its children.
+    def _pull(self, node):
+        self._data[node] = self._op(self._data[2 * node], self._data[2 * node + 1])
+
+    #Returns the aggregate of every value.
+    def all(self):
+        return self._data[1]
+
+    #Returns the value at the given index.
+    def get(self, index):
+        leaf = index + self._leaves
+        self._push_path(leaf)
+        return self._data[leaf]
+
+    #Returns the aggregate of the values in [lo, hi[ (the identity if the range is empty).
+    def query(self, lo, hi):
+        if lo >= hi:
+            return self._identity
+        op = self._op
+        data = self._data
+        lo += self._leaves
+        hi += self._leaves
+        self._push_range(lo, hi)
+        left = self._identity
+        right = self._identity
+        while lo < hi:
+            if lo & 1:
+                left = op(left, data[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right = op(data[hi], right)
+            lo >>= 1
+            hi >>= 1
+        return op(left, right)
+
+    #Sets the value at the given index.
+    def set(self, index, value):
+        leaf = index + self._leaves
+        self._push_path(leaf)
+        self._data[leaf] = value
+        for i in range(1, self._log + 1):
+            self._pull(leaf >> i)
+
+    #Returns the number of values in the tree.
+    def size(self):
+        return self._n
+
+    #Applies the given update to every value in [lo, hi[.
+    #Only supported when the tree was built with an update function.
+    def update(self, lo, hi, f):
+        if self._lazy is None:
+            raise TypeError('SegmentTree was built without range updates')
+        if lo >= hi:
+            return
+        lo += self._leaves
+        hi += self._leaves
+        self._push_range(lo, hi)
+        left, right = lo, hi
+        while left < right:
+            if left & 1:
+                self._apply_node(left, f)
+                left += 1
+            if right & 1:
+                right -= 1
+                self._apply_node(right, f)
+            left >>= 1
+            right >>= 1
+        for i in range(1, self._log + 1):
+            if ((lo >> i) << i) != lo:
+                self._pull(lo >> i)
+            if ((hi >> i) << i) != hi:
+                self._pull((hi - 1) >> i)
+
+    #Builds a tree answering range sums with range additions.
+    @classmethod
+    def sum_tree(cls, values):
+        return cls(values, lambda a, b: a + b, 0,
+                   lambda f, x, length: x + f * length, lambda f, g: f + g, 0)
+
+    #Builds a tree answering range minimums with range additions.
+    @classmethod
+    def min_tree(cls, values):
+        return cls(values, min, float('inf'),
+                   lambda f, x, length: x + f, lambda f, g: f + g, 0)
+
+    #Builds a tree answering range maximums with range additions.
+    @classmethod
+    def max_tree(cls, values):
+        return cls(values, max, float('-inf'),
+                   lambda f, x, length: x + f, lambda f, g: f + g, 0)
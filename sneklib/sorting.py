@@ -2,9 +2,55 @@
 #File:   sorting.py
 #Desc.:  Module containing various sorting functions.
 
+import array
+import heapq
+import math
+import multiprocessing
+import os
+import pickle
 import random
+import struct
+import sys
+import tempfile
 import itertools
 import data_structures
+import trees
+from multiprocessing import shared_memory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+#Size under which introsort() finishes a range using Insertion sort.
+INTROSORT_CUTOFF = 16
+#Size over which introsort() chooses its pivot using Tukey's ninther.
+NINTHER_THRESHOLD = 128
+#Size from which select() uses Floyd-Rivest instead of introselect().
+FLOYD_RIVEST_THRESHOLD = 600
+#Size under which natural_merge_sort() only uses binary Insertion sort.
+MIN_MERGE = 32
+#Number of consecutive wins after which natural_merge_sort() starts galloping.
+MIN_GALLOP = 7
+#Size under which parallel_sort() sorts the list in the current process.
+PARALLEL_SORT_THRESHOLD = 100000
+#Default memory budget (in bytes) of the runs sorted in memory by external_sort().
+EXTERNAL_SORT_MEMORY = 64 * 1024 * 1024
+#Number of records pickled together in the run files written by external_sort().
+EXTERNAL_SORT_BLOCK = 1024
+#Size from which the counting, bucket and pigeonhole sorts convert lists to NumPy arrays.
+NUMPY_THRESHOLD = 1000
+#Default number of bits per digit used by lsd_radix_sort().
+RADIX_BITS = 8
+#Size under which msd_radix_sort() sorts a bucket using Insertion sort.
+MSD_RADIX_CUTOFF = 16
+#Number of blocks, and size of each block, sampled by smart_sort().
+SMART_SORT_BLOCKS = 8
+SMART_SORT_BLOCK_SIZE = 64
+#Fraction of ordered (or reverse ordered) adjacent pairs from which smart_sort()
+#considers the input as presorted.
+SMART_SORT_PRESORTED = 0.9
 
 
 #Swaps two elements in a list .
@@ -24,20 +70,15 @@ def selection_sort(lst, reverse = False):
         _swap(lst, i, min)
 
 
-#Finds the element that would be at index k if the list was to be sorted 
-#(without necessarily sorting the list) using a shortened selection sort.
-def select(lst, k):
-    k = max(k, len(lst)-1)
-    cpy = lst[:]
-    i = 0
-    while i <= k:
-        min = i
-        for j in range(i+1, len(cpy)):
-            if cpy[j] < cpy[min]:
-                min = j
-        _swap(cpy, i, min)
-        i += 1
-    return cpy[k]
+#Finds the element that would be at index k if the list was to be sorted
+#(without necessarily sorting the list) using floyd_rivest_select() for large
+#lists and introselect() otherwise. The list is copied unless in_place is set to
+#True, in which case it is partially reordered. k is clamped to the list's bounds.
+#Complexity: O(n)
+def select(lst, k, in_place = False):
+    if len(lst) >= FLOYD_RIVEST_THRESHOLD:
+        return floyd_rivest_select(lst, k, in_place)
+    return introselect(lst, k, in_place)
 
 
 #Sorts the elements in a list using Bubble sort, 
@@ -120,13 +161,12 @@ def cocktail_sort(lst, reverse = False):
     swapped   = True
 
     while swapped:
+        swapped = False
         for i in range(left_end, right_end):
             if (not reverse and lst[i] > lst[i+1]) or\
                (    reverse and lst[i] < lst[i+1]):
                 _swap(lst, i, i+1)
                 swapped = True
-            else:
-                swapped = False
         right_end -= 1
 
         for j in range(right_end, left_end, -1):
@@ -187,13 +227,13 @@ def heap_sort(lst):
         i += 1
 
 
-#Sorts the elements in a list using Tree sort,
-#can sort in reverse order as well.
+#Sorts the elements in a list using Tree sort (with a red-black
+#tree, so O(n log n) even for sorted input), can sort in reverse order as well.
 def tree_sort(lst, reverse = False):
-    bst = trees.LinkedBST()
+    bst = trees.LinkedBST(balancing=trees.BALANCING_RED_BLACK)
     bst.insert_array(lst)
     if reverse:
-        lst[:] = bst.get_reverse_array()
+        lst[:] = bst.get_reversed_array()
     else:
         lst[:] = bst.get_sorted_array()
         
@@ -225,9 +265,7 @@ def _merge(lst, tmp, left, right, right_end):
         tmpPos += 1
         right += 1
 
-    for i in range(0, nb_elements):
-        lst[right_end] = tmp[right_end]
-        right_end -= 1
+    lst[right_end-nb_elements+1:right_end+1] = tmp[right_end-nb_elements+1:right_end+1]
 
 
 #Recursive function used to sort sections of a list (used by merge_sort()).
@@ -239,12 +277,464 @@ def _merge_sort(lst, tmp, left, right):
         _merge(lst, tmp, left, center + 1, right)
 
 
-#Sorts the elements in a list using Merge sort.
-def merge_sort(lst):
+#Sorts the elements in a list using Merge sort (top-down), or using
+#natural_merge_sort() when natural is set to True or when a key
+#or the reverse order is requested.
+def merge_sort(lst, natural = False, key = None, reverse = False):
+    if natural or key is not None or reverse:
+        natural_merge_sort(lst, key, reverse)
+        return
     tmp = [0]*len(lst)
     _merge_sort(lst, tmp, 0, len(lst)-1)
 
 
+#Returns the minimum length of the runs used by natural_merge_sort()
+#so that the number of runs is equal to, or slightly less than, a power of 2.
+def _min_run_length(n):
+    r = 0
+    while n >= MIN_MERGE:
+        r |= n & 1
+        n >>= 1
+    return n + r
+
+
+#Sorts the elements in a list, within the given range (hi is excluded), using
+#Insertion sort with a binary search, knowing that lst[lo:start] is already sorted.
+def _binary_insertion_sort(lst, lo, hi, start):
+    for i in range(start, hi):
+        pivot = lst[i]
+        left, right = lo, i
+        while left < right:
+            mid = (left + right) // 2
+            if pivot < lst[mid]:
+                right = mid
+            else:
+                left = mid + 1
+        lst[left+1:i+1] = lst[left:i]
+        lst[left] = pivot
+
+
+#Returns the length of the run starting at lo (hi is excluded), reversing
+#it in place if it is strictly descending (used by natural_merge_sort()).
+def _count_run(lst, lo, hi):
+    run_hi = lo + 1
+    if run_hi == hi:
+        return 1
+    run_hi += 1
+    if lst[lo+1] < lst[lo]:
+        while run_hi < hi and lst[run_hi] < lst[run_hi-1]:
+            run_hi += 1
+        lst[lo:run_hi] = lst[lo:run_hi][::-1]
+    else:
+        while run_hi < hi and not lst[run_hi] < lst[run_hi-1]:
+            run_hi += 1
+    return run_hi - lo
+
+
+#Returns the position at which the key should be inserted before any equal element
+#in the sorted range lst[base:base+length], galloping from the given hint.
+def _gallop_left(key, lst, base, length, hint):
+    last_ofs, ofs = 0, 1
+    if lst[base+hint] < key:
+        max_ofs = length - hint
+        while ofs < max_ofs and lst[base+hint+ofs] < key:
+            last_ofs = ofs
+            ofs = (ofs << 1) + 1
+        ofs = min(ofs, max_ofs)
+        last_ofs, ofs = last_ofs + hint, ofs + hint
+    else:
+        max_ofs = hint + 1
+        while ofs < max_ofs and not lst[base+hint-ofs] < key:
+            last_ofs = ofs
+            ofs = (ofs << 1) + 1
+        ofs = min(ofs, max_ofs)
+        last_ofs, ofs = hint - ofs, hint - last_ofs
+    last_ofs += 1
+    while last_ofs < ofs:
+        mid = last_ofs + ((ofs - last_ofs) >> 1)
+        if lst[base+mid] < key:
+            last_ofs = mid + 1
+        else:
+            ofs = mid
+    return ofs
+
+
+#Returns the position at which the key should be inserted after any equal element
+#in the sorted range lst[base:base+length], galloping from the given hint.
+def _gallop_right(key, lst, base, length, hint):
+    last_ofs, ofs = 0, 1
+    if key < lst[base+hint]:
+        max_ofs = hint + 1
+        while ofs < max_ofs and key < lst[base+hint-ofs]:
+            last_ofs = ofs
+            ofs = (ofs << 1) + 1
+        ofs = min(ofs, max_ofs)
+        last_ofs, ofs = hint - ofs, hint - last_ofs
+    else:
+        max_ofs = length - hint
+        while ofs < max_ofs and not key < lst[base+hint+ofs]:
+            last_ofs = ofs
+            ofs = (ofs << 1) + 1
+        ofs = min(ofs, max_ofs)
+        last_ofs, ofs = last_ofs + hint, ofs + hint
+    last_ofs += 1
+    while last_ofs < ofs:
+        mid = last_ofs + ((ofs - last_ofs) >> 1)
+        if key < lst[base+mid]:
+            ofs = mid
+        else:
+            last_ofs = mid + 1
+    return ofs
+
+
+#Merges two adjacent runs from left to right, the first (shortest) one
+#being copied in the temporary list (used by natural_merge_sort()).
+def _merge_lo(lst, tmp, base1, len1, base2, len2):
+    tmp[0:len1] = lst[base1:base1+len1]
+    i, end1 = 0, len1
+    j, end2 = base2, base2 + len2
+    dest = base1
+    min_gallop = MIN_GALLOP
+    while i < end1 and j < end2:
+        count1 = count2 = 0
+        while i < end1 and j < end2 and count1 < min_gallop and count2 < min_gallop:
+            if lst[j] < tmp[i]:
+                lst[dest] = lst[j]
+                j += 1
+                count1, count2 = 0, count2 + 1
+            else:
+                lst[dest] = tmp[i]
+                i += 1
+                count1, count2 = count1 + 1, 0
+            dest += 1
+        while i < end1 and j < end2:
+            count1 = _gallop_right(lst[j], tmp, i, end1 - i, 0)
+            if count1 > 0:
+                lst[dest:dest+count1] = tmp[i:i+count1]
+                dest, i = dest + count1, i + count1
+                if i == end1:
+                    break
+            lst[dest] = lst[j]
+            dest, j = dest + 1, j + 1
+            if j == end2:
+                break
+            count2 = _gallop_left(tmp[i], lst, j, end2 - j, 0)
+            if count2 > 0:
+                lst[dest:dest+count2] = lst[j:j+count2]
+                dest, j = dest + count2, j + count2
+                if j == end2:
+                    break
+            lst[dest] = tmp[i]
+            dest, i = dest + 1, i + 1
+            if count1 < MIN_GALLOP and count2 < MIN_GALLOP:
+                min_gallop += 2
+                break
+            min_gallop = max(min_gallop - 1, 1)
+    if i < end1:
+        lst[dest:dest+end1-i] = tmp[i:end1]
+
+
+#Merges two adjacent runs from right to left, the second (shortest) one
+#being copied in the temporary list (used by natural_merge_sort()).
+def _merge_hi(lst, tmp, base1, len1, base2, len2):
+    tmp[0:len2] = lst[base2:base2+len2]
+    i = base1 + len1 - 1
+    j = len2 - 1
+    dest = base2 + len2 - 1
+    min_gallop = MIN_GALLOP
+    while i >= base1 and j >= 0:
+        count1 = count2 = 0
+        while i >= base1 and j >= 0 and count1 < min_gallop and count2 < min_gallop:
+            if tmp[j] < lst[i]:
+                lst[dest] = lst[i]
+                i -= 1
+                count1, count2 = count1 + 1, 0
+            else:
+                lst[dest] = tmp[j]
+                j -= 1
+                count1, count2 = 0, count2 + 1
+            dest -= 1
+        while i >= base1 and j >= 0:
+            count1 = i - base1 + 1 - _gallop_right(tmp[j], lst, base1, i - base1 + 1, i - base1)
+            if count1 > 0:
+                lst[dest-count1+1:dest+1] = lst[i-count1+1:i+1]
+                dest, i = dest - count1, i - count1
+                if i < base1:
+                    break
+            lst[dest] = tmp[j]
+            dest, j = dest - 1, j - 1
+            if j < 0:
+                break
+            count2 = j + 1 - _gallop_left(lst[i], tmp, 0, j + 1, j)
+            if count2 > 0:
+                lst[dest-count2+1:dest+1] = tmp[j-count2+1:j+1]
+                dest, j = dest - count2, j - count2
+                if j < 0:
+                    break
+            lst[dest] = lst[i]
+            dest, i = dest - 1, i - 1
+            if count1 < MIN_GALLOP and count2 < MIN_GALLOP:
+                min_gallop += 2
+                break
+            min_gallop = max(min_gallop - 1, 1)
+    if j >= 0:
+        lst[dest-j:dest+1] = tmp[0:j+1]
+
+
+#Merges the runs at indices n and n+1 of the run stack (used by natural_merge_sort()).
+def _merge_at(lst, tmp, runs, n):
+    base1, len1 = runs[n]
+    base2, len2 = runs[n+1]
+    runs[n] = (base1, len1 + len2)
+    del runs[n+1]
+    #Elements of the first run smaller than the second run's first one are already in place.
+    k = _gallop_right(lst[base2], lst, base1, len1, 0)
+    base1, len1 = base1 + k, len1 - k
+    if len1 == 0:
+        return
+    #Elements of the second run greater than the first run's last one are already in place.
+    len2 = _gallop_left(lst[base1+len1-1], lst, base2, len2, len2 - 1)
+    if len2 == 0:
+        return
+    if len1 <= len2:
+        _merge_lo(lst, tmp, base1, len1, base2, len2)
+    else:
+        _merge_hi(lst, tmp, base1, len1, base2, len2)
+
+
+#Merges the runs on the stack until their lengths respect the invariants
+#runs[n-2] > runs[n-1] + runs[n] and runs[n-1] > runs[n].
+def _merge_collapse(lst, tmp, runs):
+    while len(runs) > 1:
+        n = len(runs) - 2
+        if (n > 0 and runs[n-1][1] <= runs[n][1] + runs[n+1][1]) or\
+           (n > 1 and runs[n-2][1] <= runs[n-1][1] + runs[n][1]):
+            if runs[n-1][1] < runs[n+1][1]:
+                n -= 1
+        elif runs[n][1] > runs[n+1][1]:
+            break
+        _merge_at(lst, tmp, runs, n)
+
+
+#Merges all the runs remaining on the stack.
+def _merge_force_collapse(lst, tmp, runs):
+    while len(runs) > 1:
+        n = len(runs) - 2
+        if n > 0 and runs[n-1][1] < runs[n+1][1]:
+            n -= 1
+        _merge_at(lst, tmp, runs, n)
+
+
+#Sorts the elements in a list using a natural Merge sort (TimSort-style).
+def _natural_merge_sort(lst):
+    length = len(lst)
+    if length < 2:
+        return
+    if length < MIN_MERGE:
+        _binary_insertion_sort(lst, 0, length, _count_run(lst, 0, length))
+        return
+    tmp = [None] * (length // 2 + 1)
+    runs = []
+    min_run = _min_run_length(length)
+    lo = 0
+    while lo < length:
+        run_length = _count_run(lst, lo, length)
+        if run_length < min_run:
+            forced = min(min_run, length - lo)
+            _binary_insertion_sort(lst, lo, lo + forced, lo + run_length)
+            run_length = forced
+        runs.append((lo, run_length))
+        _merge_collapse(lst, tmp, runs)
+        lo += run_length
+    _merge_force_collapse(lst, tmp, runs)
+
+
+#Sorts the elements in a list using a natural (stable) Merge sort: existing
+#ascending and descending runs are detected, short runs are extended using binary
+#Insertion sort and runs are merged with galloping using a single half-size buffer.
+#Can sort according to a key function and in reverse order as well.
+#Complexity: O(n*log(n)), O(n) when the list is already (reverse) sorted.
+def natural_merge_sort(lst, key = None, reverse = False):
+    if reverse:
+        lst.reverse()
+    if key is None:
+        _natural_merge_sort(lst)
+    else:
+        decorated = [(key(val), i) for i, val in enumerate(lst)]
+        _natural_merge_sort(decorated)
+        lst[:] = [lst[i] for _, i in decorated]
+    if reverse:
+        lst.reverse()
+
+
+#Sorts the given chunk in place using the given sorting function
+#or the built-in sort if None (used by parallel_sort()).
+def _sort_chunk(chunk, algorithm):
+    if algorithm is None:
+        chunk.sort()
+    else:
+        algorithm(chunk)
+    return chunk
+
+
+#Sorts a chunk sent (pickled) to a worker process and returns it.
+def _sort_list_chunk(args):
+    chunk, algorithm = args
+    return _sort_chunk(chunk, algorithm)
+
+
+#Sorts, in place, the chunk [start, end) of the numeric array stored
+#in the shared memory block with the given name (used by parallel_sort()).
+def _sort_shared_chunk(args):
+    name, typecode, start, end, algorithm = args
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf.cast(typecode)
+        view[start:end] = array.array(typecode, _sort_chunk(view[start:end].tolist(), algorithm))
+        view.release()
+    finally:
+        shm.close()
+
+
+#Returns the array typecode which can hold every element of the list
+#without loss ('q' for 64 bits integers, 'd' for floats) or None.
+def _numeric_typecode(lst):
+    if all(type(val) is int for val in lst):
+        return 'q' if -2**63 <= min(lst) and max(lst) < 2**63 else None
+    if all(type(val) is float for val in lst):
+        return 'd'
+    return None
+
+
+#Sorts the elements in a list using multiple processes: the list is split in
+#one chunk per worker, each chunk is sorted in a process pool using the given
+#sorting function (the built-in sort by default) and the sorted chunks are
+#combined using a k-way merge. Lists of integers or floats are transferred
+#through a shared memory block instead of being pickled. Lists smaller than
+#the threshold are sorted in the current process.
+def parallel_sort(lst, workers = None, algorithm = None, threshold = PARALLEL_SORT_THRESHOLD):
+    length = len(lst)
+    workers = min(workers or os.cpu_count() or 1, length)
+    if workers < 2 or length < threshold:
+        _sort_chunk(lst, algorithm)
+        return
+
+    bounds = [(length * i // workers, length * (i + 1) // workers) for i in range(workers)]
+    typecode = _numeric_typecode(lst)
+
+    if typecode is None:
+        with multiprocessing.Pool(workers) as pool:
+            chunks = pool.map(_sort_list_chunk, [(lst[start:end], algorithm) for start, end in bounds])
+        lst[:] = heapq.merge(*chunks)
+        return
+
+    #The shared memory block is created before the pool so that the
+    #workers share the resource tracker of the current process.
+    shm = shared_memory.SharedMemory(create=True, size=length * array.array(typecode).itemsize)
+    try:
+        view = shm.buf.cast(typecode)
+        view[:] = array.array(typecode, lst)
+        with multiprocessing.Pool(workers) as pool:
+            pool.map(_sort_shared_chunk, [(shm.name, typecode, start, end, algorithm) for start, end in bounds])
+        chunks = [view[start:end] for start, end in bounds]
+        lst[:] = heapq.merge(*chunks)
+        for chunk in chunks:
+            chunk.release()
+        view.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+#Wraps a key so that it compares in reverse order (used by external_sort()).
+class _ReversedKey:
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+#Writes a sorted run to an anonymous temporary file, by blocks of
+#pickled records, and returns the file rewound to its start.
+def _write_run(run, tmp_dir):
+    run_file = tempfile.TemporaryFile(dir=tmp_dir)
+    for i in range(0, len(run), EXTERNAL_SORT_BLOCK):
+        pickle.dump(run[i:i+EXTERNAL_SORT_BLOCK], run_file, pickle.HIGHEST_PROTOCOL)
+    run_file.seek(0)
+    return run_file
+
+
+#Generator yielding the records of a run written by _write_run(), one block at a time.
+def _read_run(run_file):
+    while True:
+        try:
+            block = pickle.load(run_file)
+        except EOFError:
+            return
+        yield from block
+
+
+#Generator merging the given sorted runs using a binary heap (k-way merge).
+#Ties are broken by run index so that the merge is stable.
+def _merge_runs(runs, key, reverse):
+    heap = data_structures.BinaryHeap(len(runs))
+    records = [None] * len(runs)
+    for i, run in enumerate(runs):
+        for record in run:
+            records[i] = record
+            k = record if key is None else key(record)
+            heap.insert_pair(i, (_ReversedKey(k) if reverse else k, i))
+            break
+    while not heap.empty():
+        i = heap.peek()
+        yield records[i]
+        for record in runs[i]:
+            records[i] = record
+            k = record if key is None else key(record)
+            heap.replace_pair(i, (_ReversedKey(k) if reverse else k, i))
+            break
+        else:
+            heap.pop()
+
+
+#Generator yielding the records of the given iterable (e.g. a file object,
+#yielding its lines) in sorted order using an external Merge sort: runs using
+#at most (approximately) the given memory budget are sorted in memory, spilled
+#to temporary files (in tmp_dir if given) and merged using a k-way merge, so
+#neither the input nor the output is ever fully held in memory.
+#The sort is stable and can use a key function and the reverse order as well.
+def external_sort(iterable, key = None, reverse = False, memory_budget = EXTERNAL_SORT_MEMORY, tmp_dir = None):
+    run_files = []
+    try:
+        run, run_size = [], 0
+        for record in iterable:
+            run.append(record)
+            run_size += sys.getsizeof(record) + 8 #+8 for the list's reference.
+            if run_size >= memory_budget:
+                natural_merge_sort(run, key, reverse)
+                run_files.append(_write_run(run, tmp_dir))
+                run, run_size = [], 0
+
+        natural_merge_sort(run, key, reverse)
+        if not run_files:
+            yield from run
+            return
+        if run:
+            run_files.append(_write_run(run, tmp_dir))
+        run = None
+
+        yield from _merge_runs([_read_run(run_file) for run_file in run_files], key, reverse)
+    finally:
+        for run_file in run_files:
+            run_file.close()
+
+
 
 #Partitions a list using the Lomuto partition scheme
 #(used for Quicksort and Quickselect).
@@ -261,24 +751,10 @@ def _partition(lst, left, right):
     return i
 
 
-#Recursive function used to find the element that would be at
-#index k if the list was to be sorted (used by quickselect()).
-def _quickselect(lst, left, right, k):
-     if left == right:
-         return lst[left]
-     pivotIndex = _partition(lst, left, right)
-     if k == pivotIndex:
-         return lst[k]
-     elif k < pivotIndex:
-         return _quickselect(lst, left, pivotIndex-1, k)
-     else:
-         return _quickselect(lst, pivotIndex+1, right, k)
-
-
 #Finds the element that would be at index k if the list was to be
-#sorted (without necessarily sorting the list) using Quickselect.
-def quickselect(lst, k):
-    return _quickselect(lst[:], 0, len(lst)-1, k)
+#sorted (without necessarily sorting the list) using introselect().
+def quickselect(lst, k, in_place = False):
+    return introselect(lst, k, in_place)
 
 
 #Recursive function used to sort sections of a list (used by quicksort()).
@@ -289,14 +765,323 @@ def _quicksort(lst, left, right):
         _quicksort(lst, pivot+1, right)
 
 
-#Sorts the elements in a list using Quicksort (standard implementation).
-def quicksort(lst):
-    _quicksort(lst, 0, len(lst)-1)
+#Sorts the elements in a list using Quicksort (standard implementation),
+#or using introsort() when hybrid is set to True.
+def quicksort(lst, hybrid = False, cutoff = INTROSORT_CUTOFF):
+    if hybrid:
+        introsort(lst, cutoff)
+    else:
+        _quicksort(lst, 0, len(lst)-1)
+
+
+#Returns the index of the median of the elements at indices i, j and k.
+def _median_of_three(lst, i, j, k):
+    a, b, c = lst[i], lst[j], lst[k]
+    if a < b:
+        if b < c:
+            return j
+        return k if a < c else i
+    if a < c:
+        return i
+    return k if b < c else j
+
+
+#Returns the index of the pivot to use to partition the given range
+#(median of three for small ranges, Tukey's ninther for larger ones).
+def _choose_pivot(lst, left, right):
+    mid = (left + right) // 2
+    if right - left + 1 < NINTHER_THRESHOLD:
+        return _median_of_three(lst, left, mid, right)
+    step = (right - left + 1) // 8
+    return _median_of_three(lst, _median_of_three(lst, left, left + step, left + 2*step),
+                                 _median_of_three(lst, mid - step, mid, mid + step),
+                                 _median_of_three(lst, right - 2*step, right - step, right))
+
+
+#Partitions the given range around the pivot value using the Dutch national
+#flag scheme and returns the bounds (lt, gt) of the elements equal to the pivot.
+def _partition_three_way(lst, left, right, pivot):
+    lt, i, gt = left, left, right
+    while i <= gt:
+        val = lst[i]
+        if val < pivot:
+            _swap(lst, lt, i)
+            lt += 1
+            i += 1
+        elif pivot < val:
+            _swap(lst, i, gt)
+            gt -= 1
+        else:
+            i += 1
+    return lt, gt
+
+
+#Moves the element at the given root (relative to start) down the
+#max-heap stored in lst[start:start+size] (used by _heap_sort_range()).
+def _sift_down(lst, start, root, size):
+    tmp = lst[start + root]
+    child = 2*root + 1
+    while child < size:
+        if child + 1 < size and lst[start + child] < lst[start + child + 1]:
+            child += 1
+        if not tmp < lst[start + child]:
+            break
+        lst[start + root] = lst[start + child]
+        root = child
+        child = 2*root + 1
+    lst[start + root] = tmp
+
+
+#Sorts the elements in a list, within the given range (start and end
+#are both included), using an in-place Heap sort.
+def _heap_sort_range(lst, start, end):
+    size = end - start + 1
+    for root in range(size//2 - 1, -1, -1):
+        _sift_down(lst, start, root, size)
+    for last in range(size - 1, 0, -1):
+        _swap(lst, start, start + last)
+        _sift_down(lst, start, 0, last)
+
+
+#Sorts the elements in a list using Introsort: Quicksort with median-of-three
+#(or ninther) pivots and three-way partitioning, using Insertion sort for the
+#ranges smaller than the cutoff and Heap sort once the depth exceeds 2*log2(n).
+#Uses an explicit stack (always deferring the largest range) instead of recursion.
+#Complexity: O(n*log(n))
+def introsort(lst, cutoff = INTROSORT_CUTOFF):
+    length = len(lst)
+    if length < 2:
+        return
+    cutoff = max(cutoff, 1)
+    stack = [(0, length - 1, 2 * int(math.log2(length)))]
+    while stack:
+        left, right, depth = stack.pop()
+        while right - left >= cutoff:
+            if depth == 0:
+                _heap_sort_range(lst, left, right)
+                left = right
+                break
+            depth -= 1
+            lt, gt = _partition_three_way(lst, left, right, lst[_choose_pivot(lst, left, right)])
+            if lt - left < right - gt:
+                stack.append((gt + 1, right, depth))
+                right = lt - 1
+            else:
+                stack.append((left, lt - 1, depth))
+                left = gt + 1
+        if left < right:
+            insertion_sort_range(lst, left, right)
+
+
+#Returns the given index clamped to the bounds of a list of the given length.
+def _clamp_index(k, length):
+    return min(max(k, 0), length - 1)
+
+
+#Narrows the range [left, right] to the side of the partition [lt, gt] containing k.
+#Returns None once k is within the elements equal to the pivot.
+def _narrow_range(left, right, lt, gt, k):
+    if k < lt:
+        return left, lt - 1
+    if k > gt:
+        return gt + 1, right
+    return None
+
+
+#Places at index k the element which would be there if the range [left, right]
+#was sorted, using median of medians pivots (used by introselect()).
+#Complexity: O(n) worst case.
+def _median_of_medians_select(lst, left, right, k):
+    while right > left:
+        pivot_index = _median_of_medians(lst, left, right)
+        bounds = _narrow_range(left, right, *_partition_three_way(lst, left, right, lst[pivot_index]), k)
+        if bounds is None:
+            return
+        left, right = bounds
+
+
+#Returns the index of the median of the medians of the groups of 5 elements
+#of the range [left, right], the medians being moved at the start of the range.
+def _median_of_medians(lst, left, right):
+    if right - left < 5:
+        insertion_sort_range(lst, left, right)
+        return (left + right) // 2
+    end = left
+    for start in range(left, right + 1, 5):
+        group_end = min(start + 4, right)
+        insertion_sort_range(lst, start, group_end)
+        _swap(lst, (start + group_end) // 2, end)
+        end += 1
+    mid = (left + end - 1) // 2
+    _median_of_medians_select(lst, left, end - 1, mid)
+    return mid
+
+
+#Places at index k the element which would be there if the range [left, right]
+#was sorted, using Quickselect with median-of-three (or ninther) pivots and
+#three-way partitioning, switching to median of medians pivots once the number of
+#partitions exceeds 2*log2(n) (used by introselect() and floyd_rivest_select()).
+def _introselect(lst, left, right, k):
+    depth = 2 * int(math.log2(right - left + 1))
+    while right - left >= INTROSORT_CUTOFF:
+        if depth == 0:
+            _median_of_medians_select(lst, left, right, k)
+            return
+        depth -= 1
+        bounds = _narrow_range(left, right, *_partition_three_way(lst, left, right, lst[_choose_pivot(lst, left, right)]), k)
+        if bounds is None:
+            return
+        left, right = bounds
+    insertion_sort_range(lst, left, right)
+
+
+#Finds the element that would be at index k if the list was to be sorted
+#(without necessarily sorting the list) using Introselect. The list is copied
+#unless in_place is set to True, in which case it is partially reordered.
+#Complexity: O(n) worst case.
+def introselect(lst, k, in_place = False):
+    if len(lst) == 0:
+        return None
+    cpy = lst if in_place else lst[:]
+    k = _clamp_index(k, len(cpy))
+    _introselect(cpy, 0, len(cpy) - 1, k)
+    return cpy[k]
+
+
+#Places at index k the element which would be there if the range [left, right]
+#was sorted using the Floyd-Rivest algorithm: the range is first narrowed around k
+#by recursively selecting from a sample, so that the pivot lands very close to k.
+def _floyd_rivest_select(lst, left, right, k):
+    while right - left >= FLOYD_RIVEST_THRESHOLD:
+        n = right - left + 1
+        i = k - left + 1
+        z = math.log(n)
+        s = 0.5 * math.exp(2 * z / 3)
+        sd = 0.5 * math.sqrt(z * s * (n - s) / n) * (-1 if i < n / 2 else 1)
+        _floyd_rivest_select(lst, max(left, int(k - i * s / n + sd)), min(right, int(k + (n - i) * s / n + sd)), k)
+        bounds = _narrow_range(left, right, *_partition_three_way(lst, left, right, lst[k]), k)
+        if bounds is None:
+            return
+        left, right = bounds
+    _introselect(lst, left, right, k)
+
+
+#Finds the element that would be at index k if the list was to be sorted
+#(without necessarily sorting the list) using the Floyd-Rivest algorithm. The list
+#is copied unless in_place is set to True, in which case it is partially reordered.
+#Complexity: O(n) expected, with about n + min(k, n - k) comparisons.
+def floyd_rivest_select(lst, k, in_place = False):
+    if len(lst) == 0:
+        return None
+    cpy = lst if in_place else lst[:]
+    k = _clamp_index(k, len(cpy))
+    _floyd_rivest_select(cpy, 0, len(cpy) - 1, k)
+    return cpy[k]
+
+
+#Finds the elements that would be at each of the given indices if the list was
+#to be sorted (e.g. several percentiles) and returns them in the order of the
+#indices. Every partition is shared by all the indices within its range, so
+#the work is close to that of a single selection. The list is copied unless
+#in_place is set to True, in which case it is partially reordered.
+#Complexity: O(n*log(m)) where m is the number of indices.
+def multiselect(lst, ks, in_place = False):
+    if len(lst) == 0:
+        return [None for _ in ks]
+    cpy = lst if in_place else lst[:]
+    length = len(cpy)
+    ks = [_clamp_index(k, length) for k in ks]
+    sorted_ks = sorted(set(ks))
+
+    #Each entry holds a range and the slice of sorted_ks which falls in it.
+    stack = [(0, length - 1, 0, len(sorted_ks), 2 * int(math.log2(length)))]
+    while stack:
+        left, right, k_lo, k_hi, depth = stack.pop()
+        if right - left < INTROSORT_CUTOFF:
+            insertion_sort_range(cpy, left, right)
+            continue
+        if depth == 0:
+            for k in sorted_ks[k_lo:k_hi]:
+                _median_of_medians_select(cpy, left, right, k)
+                left = k + 1
+            continue
+
+        lt, gt = _partition_three_way(cpy, left, right, cpy[_choose_pivot(cpy, left, right)])
+        mid_lo = k_lo
+        while mid_lo < k_hi and sorted_ks[mid_lo] < lt:
+            mid_lo += 1
+        mid_hi = mid_lo
+        while mid_hi < k_hi and sorted_ks[mid_hi] <= gt:
+            mid_hi += 1
+        if k_lo < mid_lo:
+            stack.append((left, lt - 1, k_lo, mid_lo, depth - 1))
+        if mid_hi < k_hi:
+            stack.append((gt + 1, right, mid_hi, k_hi, depth - 1))
+
+    return [cpy[k] for k in ks]
+
+
+#Returns the k greatest elements of the given iterable (which can be a generator)
+#in descending order, or the k smallest ones in ascending order when reverse is
+#set to False, using a heap bounded to k entries. Equal elements are returned in
+#the order they were produced, like sorted(iterable, key, reverse)[:k] would.
+#Complexity: O(n*log(k)) time and O(k) memory.
+def top_k(iterable, k, key = None, reverse = True):
+    if k <= 0:
+        return []
+    heap = []
+    for index, item in enumerate(iterable):
+        item_key = item if key is None else key(item)
+        #The root of the heap is the worst kept entry, later elements losing ties.
+        entry = (item_key if reverse else _ReversedKey(item_key), -index, item)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif heap[0] < entry:
+            heapq.heapreplace(heap, entry)
+    heap.sort(reverse=True)
+    return [entry[2] for entry in heap]
+
+
+#Sorts only the first k positions of a list in place, so that they hold the
+#k smallest elements (or the k greatest ones if reverse is set to True) in order,
+#the other elements being left in an unspecified order. Uses introselect() to
+#partition the list around index k-1, then sorts the first k elements.
+#Complexity: O(n + k*log(k))
+def partial_sort(lst, k, key = None, reverse = False):
+    length = len(lst)
+    k = min(k, length)
+    if k <= 0:
+        return
+
+    if key is None and not reverse:
+        if k < length:
+            _introselect(lst, 0, length - 1, k - 1)
+        head = lst[:k]
+        natural_merge_sort(head)
+        lst[:k] = head
+        return
+
+    #Equal keys are ordered by index, which also keeps the partial sort stable.
+    decorated = []
+    for i, val in enumerate(lst):
+        val_key = val if key is None else key(val)
+        decorated.append((_ReversedKey(val_key) if reverse else val_key, i))
+    if k < length:
+        _introselect(decorated, 0, length - 1, k - 1)
+    head = decorated[:k]
+    natural_merge_sort(head)
+    decorated[:k] = head
+    lst[:] = [lst[i] for _, i in decorated]
 
 
 #Sorts the elements in a list using Counting sort (use only 
 #when the range of values is smaller or equal than the number of values).
 def counting_sort(lst):
+    arr = _as_numpy_array(lst)
+    if arr is not None:
+        _numpy_counting_sort(lst, arr)
+        return
+
     min_val, max_val = min(lst), max(lst)
     size = max_val - min_val + 1
     counts = [0]*size
@@ -314,6 +1099,15 @@ def counting_sort(lst):
 #Sorts the elements in a list usin Bucket sort (use only 
 #when the range of values is smaller or equal than the number of values). 
 def bucket_sort(lst, nb_buckets=10, cutoff=0):
+    arr = _as_numpy_array(lst)
+    if arr is not None:
+        _numpy_bucket_sort(lst, arr)
+        return
+    _bucket_sort(lst, nb_buckets, cutoff)
+
+
+#Recursive function used to sort the buckets (used by bucket_sort()).
+def _bucket_sort(lst, nb_buckets, cutoff):
     if nb_buckets == 1 or len(lst) <= cutoff:
         insertion_sort(lst)
         return
@@ -330,7 +1124,7 @@ def bucket_sort(lst, nb_buckets=10, cutoff=0):
         buckets[(val-min_val) // bucket_range].append(val)
 
     for bucket in buckets:
-        bucket_sort(bucket, nb_buckets, cutoff)
+        _bucket_sort(bucket, nb_buckets, cutoff)
 
     lst[:] = list(itertools.chain.from_iterable(buckets))
     
@@ -339,8 +1133,15 @@ def bucket_sort(lst, nb_buckets=10, cutoff=0):
 #Sorts the elements, given as (key, val) tuples, in a list using Pigeonhole sort 
 #(use only when the range of values is smaller or equal than the number of values).
 def pingeonhole_sort(lst):
-    min_val = min(lst, key=lambda e : e[0])
-    max_val = max(lst, key=lambda e : e[0])
+    if numpy is not None and (isinstance(lst, numpy.ndarray) or len(lst) >= NUMPY_THRESHOLD):
+        keys = lst[:, 0] if isinstance(lst, numpy.ndarray) else [e[0] for e in lst]
+        arr = _as_numpy_array(keys)
+        if arr is not None:
+            _numpy_pigeonhole_sort(lst, arr)
+            return
+
+    min_val = min(e[0] for e in lst)
+    max_val = max(e[0] for e in lst)
     size = max_val - min_val + 1
     indexed_vals = [[] for i in range(0, size)]
 
@@ -357,4 +1158,272 @@ def pingeonhole_sort(lst):
 #Returns a list containing the value of each (key,value) tuple in the list
 #(useful when using pingeon_hole_sort() to keep only the values after sorting).
 def strip_keys(lst):
-    return [tup[1] for tup in lst]
\ No newline at end of file
+    return [tup[1] for tup in lst]
+
+
+#Returns the given list as a NumPy array if NumPy is available and the list is
+#either an array of integers or a homogeneous list of 64 bits integers large
+#enough for the conversion to pay off. Returns None otherwise, in which case
+#the pure Python implementation is used.
+def _as_numpy_array(lst):
+    if numpy is None:
+        return None
+    if isinstance(lst, numpy.ndarray):
+        return lst if lst.ndim == 1 and lst.dtype.kind in 'iu' else None
+    if len(lst) < NUMPY_THRESHOLD or _numeric_typecode(lst) != 'q':
+        return None
+    return numpy.array(lst, dtype=numpy.int64)
+
+
+#Stores the sorted array in the given list (in place if it is an array).
+def _store_numpy_result(lst, result):
+    if isinstance(lst, numpy.ndarray):
+        lst[:] = result
+    else:
+        lst[:] = result.tolist()
+
+
+#Sorts the elements in a list using Counting sort vectorized with NumPy.
+def _numpy_counting_sort(lst, arr):
+    min_val = arr.min()
+    counts = numpy.bincount((arr - min_val).astype(numpy.intp))
+    values = numpy.arange(len(counts), dtype=arr.dtype) + min_val
+    _store_numpy_result(lst, numpy.repeat(values, counts))
+
+
+#Sorts the elements in a list using Bucket sort vectorized with NumPy. Since the
+#buckets partition the range of values in order, sorting every bucket and
+#concatenating them amounts to a single stable sort of the whole array.
+def _numpy_bucket_sort(lst, arr):
+    if isinstance(lst, numpy.ndarray):
+        lst.sort(kind='stable')
+    else:
+        arr.sort(kind='stable')
+        lst[:] = arr.tolist()
+
+
+#Sorts the (key, val) entries in a list (or a two-columns array) using
+#Pigeonhole sort vectorized with NumPy: the entries are reordered by a stable
+#argsort of their keys, which keeps the values of equal keys in their order.
+def _numpy_pigeonhole_sort(lst, keys):
+    order = numpy.argsort(keys, kind='stable')
+    if isinstance(lst, numpy.ndarray):
+        lst[:] = lst[order]
+    else:
+        lst[:] = [lst[i] for i in order.tolist()]
+
+
+#Returns an unsigned integer which preserves the order of the given float
+#(useful as the key of lsd_radix_sort() to sort floats). Negative floats have
+#all their bits flipped, positive ones only their sign bit, so -0.0 is placed
+#before 0.0 and NaNs (depending on their sign) at either end.
+def float_sort_key(x):
+    bits = struct.unpack('>Q', struct.pack('>d', x))[0]
+    return bits ^ 0xFFFFFFFFFFFFFFFF if bits >> 63 else bits | (1 << 63)
+
+
+#Sorts the elements in a list of integers (or according to an integer key)
+#using a stable LSD Radix sort with digits of the given number of bits.
+#Only the span between the minimum and the maximum key determines the number
+#of passes, so wide-ranged values never need a slot per possible value.
+#Complexity: O(n*w) time and O(n + 2^radix_bits) memory, where w = span_bits/radix_bits.
+def lsd_radix_sort(lst, radix_bits = RADIX_BITS, key = None):
+    if radix_bits < 1:
+        raise ValueError('Radix sort digits must have at least one bit')
+    length = len(lst)
+    if length < 2:
+        return
+    keys = lst[:] if key is None else [key(val) for val in lst]
+    vals = None if key is None else lst[:]
+    min_key = min(keys)
+    keys = [k - min_key for k in keys]
+    width = max(keys).bit_length()
+    radix = 1 << radix_bits
+    mask = radix - 1
+
+    shift = 0
+    while shift < width:
+        counts = [0] * radix
+        for k in keys:
+            counts[(k >> shift) & mask] += 1
+        pos = 0
+        for digit in range(radix):
+            counts[digit], pos = pos, pos + counts[digit]
+
+        sorted_keys = [0] * length
+        sorted_vals = None if vals is None else [None] * length
+        for i in range(length):
+            k = keys[i]
+            digit = (k >> shift) & mask
+            pos = counts[digit]
+            sorted_keys[pos] = k
+            if vals is not None:
+                sorted_vals[pos] = vals[i]
+            counts[digit] = pos + 1
+        keys, vals = sorted_keys, sorted_vals
+        shift += radix_bits
+
+    lst[:] = [k + min_key for k in keys] if vals is None else vals
+
+
+#Sorts the elements in a list of strings or bytes using a stable MSD Radix sort,
+#distributing each range by the character at the current depth and using
+#Insertion sort for the buckets smaller or equal than the cutoff.
+#Uses an explicit stack instead of recursion.
+#Complexity: O(n*w) where w is the length of the common prefixes.
+def msd_radix_sort(lst, cutoff = MSD_RADIX_CUTOFF):
+    stack = [(0, len(lst), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi - lo <= cutoff:
+            insertion_sort_range(lst, lo, hi - 1)
+            continue
+
+        buckets = {}
+        for i in range(lo, hi):
+            val = lst[i]
+            if depth >= len(val):
+                code = -1 #Shorter strings come first.
+            else:
+                code = val[depth]
+                if isinstance(code, str):
+                    code = ord(code)
+            bucket = buckets.get(code)
+            if bucket is None:
+                buckets[code] = [val]
+            else:
+                bucket.append(val)
+
+        pos = lo
+        for code in sorted(buckets):
+            bucket = buckets[code]
+            lst[pos:pos+len(bucket)] = bucket
+            if code >= 0 and len(bucket) > 1:
+                stack.append((pos, pos + len(bucket), depth + 1))
+            pos += len(bucket)
+
+
+#-------------------------------Adaptive sorting-------------------------------
+
+#Statistics gathered by smart_sort() on (a sample of) its input,
+#along with the algorithm it chose and the reason for that choice.
+class SortStats:
+    def __init__(self):
+        self.size = 0
+        self.sample_size = 0
+        self.element_type = None
+        self.sortedness = 1.0 #Fraction of ordered adjacent pairs in the sample.
+        self.runs = 0 #Number of ascending runs in the sample.
+        self.duplicate_ratio = 0.0
+        self.min_value = None
+        self.max_value = None
+        self.algorithm = None
+        self.reason = None
+
+    #Returns a string summarizing the statistics and the decision.
+    def __str__(self):
+        return '%s: %s (size=%d, sample=%d, type=%s, sortedness=%.2f, runs=%d, duplicates=%.2f, min=%s, max=%s)' %\
+               (self.algorithm, self.reason, self.size, self.sample_size,
+                None if self.element_type is None else self.element_type.__name__,
+                self.sortedness, self.runs, self.duplicate_ratio, self.min_value, self.max_value)
+
+
+#Returns evenly spaced blocks of the list (the whole list if it is small enough).
+def _sample_blocks(lst):
+    length = len(lst)
+    if length <= SMART_SORT_BLOCKS * SMART_SORT_BLOCK_SIZE:
+        return [lst[:]]
+    step = (length - SMART_SORT_BLOCK_SIZE) // (SMART_SORT_BLOCKS - 1)
+    return [lst[i*step:i*step+SMART_SORT_BLOCK_SIZE] for i in range(SMART_SORT_BLOCKS)]
+
+
+#Fills the given stats using a sample of the list (or of its keys).
+def _gather_sort_stats(lst, key, stats):
+    blocks = _sample_blocks(lst)
+    if key is not None:
+        blocks = [[key(val) for val in block] for block in blocks]
+    sample = list(itertools.chain.from_iterable(blocks))
+
+    stats.size = len(lst)
+    stats.sample_size = len(sample)
+    types = {type(val) for val in sample}
+    stats.element_type = types.pop() if len(types) == 1 else None
+
+    pairs, ordered = 0, 0
+    for block in blocks:
+        for i in range(1, len(block)):
+            pairs += 1
+            if not block[i] < block[i-1]:
+                ordered += 1
+    stats.sortedness = ordered / pairs if pairs > 0 else 1.0
+    stats.runs = pairs - ordered + len(blocks) if sample else 0
+
+    try:
+        stats.duplicate_ratio = 1 - len(set(sample)) / len(sample) if sample else 0.0
+    except TypeError: #Unhashable elements.
+        stats.duplicate_ratio = 0.0
+
+
+#Records the chosen algorithm and the reason for that choice.
+def _choose_algorithm(stats, algorithm, reason):
+    stats.algorithm = algorithm
+    stats.reason = reason
+
+
+#Sorts the elements in a list (according to a key if given) using the algorithm
+#which should be the cheapest according to a sample of the input: its size,
+#presortedness, element type, duplicate ratio and, for integers, range of values.
+#The statistics and the decision (with its reason) are stored in the given
+#SortStats object if any, so that the choice can be audited.
+#(Bucket sort is never chosen since Counting and Radix sorts dominate it on integers.)
+def smart_sort(lst, key = None, stats = None):
+    if stats is None:
+        stats = SortStats()
+    _gather_sort_stats(lst, key, stats)
+    length = stats.size
+
+    if length < MIN_MERGE:
+        if key is None:
+            _choose_algorithm(stats, 'insertion_sort', 'small input')
+            insertion_sort(lst)
+        else:
+            _choose_algorithm(stats, 'natural_merge_sort', 'small input (binary Insertion sort) with a key')
+            natural_merge_sort(lst, key)
+        return
+
+    if stats.sortedness >= SMART_SORT_PRESORTED or stats.sortedness <= 1 - SMART_SORT_PRESORTED:
+        _choose_algorithm(stats, 'natural_merge_sort', 'presorted input (long ascending or descending runs)')
+        natural_merge_sort(lst, key)
+        return
+
+    if stats.element_type is int:
+        keys = lst if key is None else [key(val) for val in lst]
+        if all(type(k) is int for k in keys):
+            stats.min_value, stats.max_value = min(keys), max(keys)
+            radix_bits = 16 if length >= 1 << 16 else RADIX_BITS
+            if key is None and stats.max_value - stats.min_value < 2 * length:
+                _choose_algorithm(stats, 'counting_sort', 'integers with a range smaller than twice the size')
+                counting_sort(lst)
+            elif key is None:
+                _choose_algorithm(stats, 'lsd_radix_sort', 'integers with a wide range')
+                lsd_radix_sort(lst, radix_bits)
+            else:
+                _choose_algorithm(stats, 'lsd_radix_sort', 'integer keys')
+                order = list(range(length))
+                lsd_radix_sort(order, radix_bits, keys.__getitem__)
+                lst[:] = [lst[i] for i in order]
+            return
+
+    if key is None and stats.element_type in (str, bytes):
+        _choose_algorithm(stats, 'msd_radix_sort', 'strings')
+        msd_radix_sort(lst)
+    elif key is None and stats.duplicate_ratio >= 0.5:
+        _choose_algorithm(stats, 'introsort', 'many duplicates (three-way partitioning)')
+        introsort(lst)
+    elif key is None:
+        _choose_algorithm(stats, 'introsort', 'general input')
+        introsort(lst)
+    else:
+        _choose_algorithm(stats, 'natural_merge_sort', 'general input with a key')
+        natural_merge_sort(lst, key)
+
@@ -2,6 +2,14 @@
 #File:   trees.py
 #Desc.:  A module containing my implementation of various tree data structures.
 
+import array
+import bisect
+import collections
+import mmap
+import os
+import struct
+import weakref
+
 
 #----------------------------------Array BST-----------------------------------
 
@@ -138,126 +146,442 @@ class ArrayBST:
     def min(self):
         return self._entries[self._get_leftmost(0)] if not self.is_empty() else None
 
-    #Recursive method used to build an array where the elements'
-    #order corresponds to the post-order traversal of the tree.
-    def _get_postorder_array(self, root, array):
-        if self._cur_size > 0 and root < self._max_size and self._entries[root] != None:    
-            self._get_postorder_array(self._get_left_child(root), array)
-            self._get_postorder_array(self._get_right_child(root), array)
-            array.append(self._entries[root])
+    #Returns a boolean indicating if there is a node at the given index.
+    def _is_node(self, index):
+        return index < self._max_size and self._entries[index] is not None
+
+    #Iterates over the values of the tree in sorted order, restricted to [lo, hi[
+    #(lo and hi are unbounded when None). Only the path from the root to the
+    #current node is stored, so stopping early is cheap. The tree must not be
+    #modified during the iteration.
+    #Complexity: O(height) memory
+    def iter_sorted(self, lo = None, hi = None):
+        stack = []
+        pos = 0
+        while True:
+            while self._is_node(pos):
+                if lo is not None and self._entries[pos] < lo:
+                    pos = self._get_right_child(pos)
+                else:
+                    stack.append(pos)
+                    pos = self._get_left_child(pos)
+            if not stack:
+                return
+            pos = stack.pop()
+            value = self._entries[pos]
+            if hi is not None and not value < hi:
+                return
+            yield value
+            pos = self._get_right_child(pos)
+
+    #Iterates over the values of the tree in reverse sorted order,
+    #restricted to [lo, hi[ (lo and hi are unbounded when None).
+    #Complexity: O(height) memory
+    def iter_reversed(self, lo = None, hi = None):
+        stack = []
+        pos = 0
+        while True:
+            while self._is_node(pos):
+                if hi is not None and not self._entries[pos] < hi:
+                    pos = self._get_left_child(pos)
+                else:
+                    stack.append(pos)
+                    pos = self._get_right_child(pos)
+            if not stack:
+                return
+            pos = stack.pop()
+            value = self._entries[pos]
+            if lo is not None and value < lo:
+                return
+            yield value
+            pos = self._get_left_child(pos)
+
+    #Iterates over the values of the tree in pre-order.
+    #Complexity: O(height) memory
+    def iter_preorder(self):
+        stack = [0] if self._is_node(0) else []
+        while stack:
+            pos = stack.pop()
+            yield self._entries[pos]
+            for child in (self._get_right_child(pos), self._get_left_child(pos)):
+                if self._is_node(child):
+                    stack.append(child)
+
+    #Iterates over the values of the tree in post-order.
+    #Complexity: O(height) memory
+    def iter_postorder(self):
+        stack = []
+        pos = 0
+        last = None
+        while True:
+            while self._is_node(pos):
+                stack.append(pos)
+                pos = self._get_left_child(pos)
+            if not stack:
+                return
+            top = stack[-1]
+            right = self._get_right_child(top)
+            if self._is_node(right) and last != right:
+                pos = right
+            else:
+                last = stack.pop()
+                yield self._entries[last]
+                pos = self._max_size #No node: go back up.
+
+    #Iterates over the values of the tree in sorted order.
+    def __iter__(self):
+        return self.iter_sorted()
+
+    #Iterates over the values of the tree in reverse sorted order.
+    def __reversed__(self):
+        return self.iter_reversed()
 
     #Returns an array where the elements' order
     #corresponds to the post-order traversal of the tree.
     def get_postorder_array(self):
-        array = []
-        self._get_postorder_array(0, array)
-        return array
-
-    #Recursive method used to build an array where the elements'
-    #order corresponds to the pre-order traversal of the tree.
-    def _get_preorder_array(self, root, array):
-        if self._cur_size > 0 and root < self._max_size and self._entries[root] != None:
-            array.append(self._entries[root])
-            self._get_preorder_array(self._get_left_child(root), array)
-            self._get_preorder_array(self._get_right_child(root), array)
+        return list(self.iter_postorder())
 
     #Returns an array where the elements' order
     #corresponds to the pre-order traversal of the tree.
     def get_preorder_array(self):
-        array = []
-        self._get_preorder_array(0, array)
-        return array
-
-    #Recursive method used to build a reversly sorted array from the tree.
-    def _get_reversed_array(self, root, array):
-        if self._cur_size > 0 and root < self._max_size and self._entries[root] != None:
-            self._get_reversed_array(self._get_right_child(root), array)
-            array.append(self._entries[root])
-            self._get_reversed_array(self._get_left_child(root), array)
+        return list(self.iter_preorder())
 
     #Returns a reversly sorted array containing all the elements in the tree.
     def get_reversed_array(self):
-        array = []
-        self._get_reversed_array(0, array)
-        return array
-    
-    #Recursive method used to build a sorted array from the tree.
-    def _get_sorted_array(self, root, array):
-        if self._cur_size > 0 and root < self._max_size and self._entries[root] != None:
-            self._get_sorted_array(self._get_left_child(root), array)
-            array.append(self._entries[root])
-            self._get_sorted_array(self._get_right_child(root), array)
+        return list(self.iter_reversed())
 
     #Returns a sorted array containing all the elements in the tree.
     def get_sorted_array(self):
-        array = []
-        self._get_sorted_array(0, array)
-        return array
+        return list(self.iter_sorted())
+
+    #Builds a balanced tree from the given sorted values (without duplicates)
+    #using exactly n slots: the values are laid out in Eytzinger order, which
+    #fills the underlying array level by level without gaps.
+    #Complexity: O(n)
+    @classmethod
+    def from_sorted(cls, values):
+        values = list(values)
+        tree = cls(0)
+        tree._entries = [None] + values #One-indexed during the build.
+        _fill_eytzinger(tree._entries, values)
+        del tree._entries[0]
+        tree._cur_size = tree._max_size = len(values)
+        return tree
 
     
 #---------------------------------Linked BST-----------------------------------
 
+#Balancing strategies supported by LinkedBST.
+BALANCING_NONE = None
+BALANCING_AVL = 'avl'
+BALANCING_RED_BLACK = 'red-black'
+
+
+#Class used to represent a node in a linked BST. The height is maintained
+#for the AVL balancing and the color for the red-black balancing. The size
+#is the number of values in the subtree (duplicates included) and the
+#aggregate is the value of the tree's aggregate function for the subtree.
 class BinaryTreeNode:
-    def __init__(self, value, left_child=None, right_child=None):
+    __slots__ = ('value', 'left_child', 'right_child', 'parent', 'nb_occurences', 'height', 'red', 'size', 'aggregate')
+
+    def __init__(self, value, left_child=None, right_child=None, parent=None):
         self.value = value
         self.left_child = left_child
         self.right_child = right_child
+        self.parent = parent
         self.nb_occurences = 1
-
-
-#Binary search tree implemented using linked nodes.
+        self.height = 1
+        self.red = True
+        self.size = 1
+        self.aggregate = None
+
+
+#Binary search tree implemented using linked nodes. The tree can be kept
+#balanced by setting "balancing" to BALANCING_AVL or BALANCING_RED_BLACK,
+#in which case inserting, removing and searching are O(log n) even for
+#sorted input. Every operation is iterative (the depth of an unbalanced
+#tree isn't limited by the recursion limit). Duplicates are counted in
+#their node rather than inserted as new nodes.
+#Every node stores the size of its subtree, which gives the rank of a value
+#and the k-th smallest value in O(height). An aggregate of every subtree can
+#also be maintained by giving a function aggregate(value, nb_occurences,
+#left, right) computing it from the node and the aggregates of its children
+#(None for empty subtrees), e.g. for the sum of the values:
+#lambda value, n, left, right: value * n + (left or 0) + (right or 0)
 class LinkedBST:
-    def __init__(self, root=None):
+    def __init__(self, root=None, balancing = BALANCING_NONE, aggregate = None):
+        if balancing not in (BALANCING_NONE, BALANCING_AVL, BALANCING_RED_BLACK):
+            raise ValueError('Unknown balancing strategy: ' + str(balancing))
         self.root = root
-
+        self._balancing = balancing
+        self._aggregate = aggregate
+        order = [] #Nodes in pre-order, to update them from the leaves up.
+        stack = [] if root is None else [root]
+        while stack: #Link the given nodes to their parents.
+            node = stack.pop()
+            order.append(node)
+            for child in (node.left_child, node.right_child):
+                if child is not None:
+                    child.parent = node
+                    stack.append(child)
+        for node in reversed(order):
+            self._update(node)
+
+    #Returns the number of values in the tree (duplicates included).
     def __len__(self):
         return self.count()
 
-    #Recursive method used to check if the 
-    #specified value is present in the tree.
-    def _contains(self, node, value):
-        if node is None:
-            return False
-        if value < node.value:
-            return self._contains(node.left_child, value)
-        if value > node.value:
-            return self._contains(node.right_child, value)
-        return True
+    #Returns the height of the given subtree (0 if it is empty).
+    def _height(self, node):
+        return 0 if node is None else node.height
+
+    #Returns the number of values in the given subtree (0 if it is empty).
+    def _subtree_size(self, node):
+        return 0 if node is None else node.size
+
+    #Returns a boolean indicating if the given node is red (empty subtrees are black).
+    def _is_red(self, node):
+        return node is not None and node.red
+
+    #Recomputes the information stored in the node from its children.
+    def _update(self, node):
+        left = node.left_child
+        right = node.right_child
+        node.height = 1 + max(self._height(left), self._height(right))
+        node.size = node.nb_occurences + self._subtree_size(left) + self._subtree_size(right)
+        if self._aggregate is not None:
+            node.aggregate = self._aggregate(node.value, node.nb_occurences,
+                                             None if left is None else left.aggregate,
+                                             None if right is None else right.aggregate)
+
+    #Replaces the given child of the given parent (or the root if parent is None).
+    def _replace_child(self, parent, old_child, new_child):
+        if parent is None:
+            self.root = new_child
+        elif parent.left_child is old_child:
+            parent.left_child = new_child
+        else:
+            parent.right_child = new_child
+        if new_child is not None:
+            new_child.parent = parent
+
+    #Rotates the subtree rooted at the given node to the left and returns its new root.
+    def _rotate_left(self, node):
+        pivot = node.right_child
+        node.right_child = pivot.left_child
+        if pivot.left_child is not None:
+            pivot.left_child.parent = node
+        self._replace_child(node.parent, node, pivot)
+        pivot.left_child = node
+        node.parent = pivot
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    #Rotates the subtree rooted at the given node to the right and returns its new root.
+    def _rotate_right(self, node):
+        pivot = node.left_child
+        node.left_child = pivot.right_child
+        if pivot.right_child is not None:
+            pivot.right_child.parent = node
+        self._replace_child(node.parent, node, pivot)
+        pivot.right_child = node
+        node.parent = pivot
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    #Restores the AVL property of the given node (whose subtrees' heights
+    #differ by 2) with one or two rotations and returns the new subtree root.
+    def _rebalance_avl(self, node):
+        if self._height(node.left_child) > self._height(node.right_child):
+            child = node.left_child
+            if self._height(child.left_child) < self._height(child.right_child):
+                self._rotate_left(child)
+            return self._rotate_right(node)
+        child = node.right_child
+        if self._height(child.right_child) < self._height(child.left_child):
+            self._rotate_right(child)
+        return self._rotate_left(node)
+
+    #Updates the nodes from the given one up to the root, rebalancing them
+    #if the tree uses the AVL balancing.
+    def _retrace(self, node):
+        avl = self._balancing == BALANCING_AVL
+        while node is not None:
+            self._update(node)
+            if avl and abs(self._height(node.left_child) - self._height(node.right_child)) > 1:
+                node = self._rebalance_avl(node)
+            node = node.parent
+
+    #Restores the red-black properties after inserting the given (red) node.
+    def _fix_red_black_insert(self, node):
+        while node is not self.root and node.parent.red:
+            parent = node.parent
+            grandparent = parent.parent
+            if parent is grandparent.left_child:
+                uncle = grandparent.right_child
+                if self._is_red(uncle):
+                    parent.red = uncle.red = False
+                    grandparent.red = True
+                    node = grandparent
+                    continue
+                if node is parent.right_child:
+                    node = parent
+                    self._rotate_left(node)
+                    parent = node.parent
+                parent.red = False
+                grandparent.red = True
+                self._rotate_right(grandparent)
+            else:
+                uncle = grandparent.left_child
+                if self._is_red(uncle):
+                    parent.red = uncle.red = False
+                    grandparent.red = True
+                    node = grandparent
+                    continue
+                if node is parent.left_child:
+                    node = parent
+                    self._rotate_right(node)
+                    parent = node.parent
+                parent.red = False
+                grandparent.red = True
+                self._rotate_left(grandparent)
+        self.root.red = False
+
+    #Restores the red-black properties when the given node (still in the
+    #tree) carries an extra black after a black node was removed above it.
+    def _fix_red_black_remove(self, node):
+        while node is not self.root and not node.red:
+            parent = node.parent
+            if node is parent.left_child:
+                sibling = parent.right_child
+                if sibling.red:
+                    sibling.red = False
+                    parent.red = True
+                    self._rotate_left(parent)
+                    sibling = parent.right_child
+                if not self._is_red(sibling.left_child) and not self._is_red(sibling.right_child):
+                    sibling.red = True
+                    node = parent
+                else:
+                    if not self._is_red(sibling.right_child):
+                        sibling.left_child.red = False
+                        sibling.red = True
+                        self._rotate_right(sibling)
+                        sibling = parent.right_child
+                    sibling.red = parent.red
+                    parent.red = False
+                    sibling.right_child.red = False
+                    self._rotate_left(parent)
+                    node = self.root
+            else:
+                sibling = parent.left_child
+                if sibling.red:
+                    sibling.red = False
+                    parent.red = True
+                    self._rotate_right(parent)
+                    sibling = parent.left_child
+                if not self._is_red(sibling.left_child) and not self._is_red(sibling.right_child):
+                    sibling.red = True
+                    node = parent
+                else:
+                    if not self._is_red(sibling.left_child):
+                        sibling.right_child.red = False
+                        sibling.red = True
+                        self._rotate_left(sibling)
+                        sibling = parent.left_child
+                    sibling.red = parent.red
+                    parent.red = False
+                    sibling.left_child.red = False
+                    self._rotate_right(parent)
+                    node = self.root
+        node.red = False
+
+    #Removes the given node from the tree (whatever its number of occurences).
+    def _remove_node(self, node):
+        if node.left_child is not None and node.right_child is not None:
+            successor = self._get_leftmost_node(node.right_child)
+            node.value = successor.value
+            node.nb_occurences = successor.nb_occurences
+            node = successor
+        red_black = self._balancing == BALANCING_RED_BLACK
+        replacement = node.left_child if node.left_child is not None else node.right_child
+        parent = node.parent
+        if replacement is not None:
+            self._replace_child(parent, node, replacement)
+            node.left_child = node.right_child = node.parent = None
+            if red_black and not node.red:
+                self._fix_red_black_remove(replacement)
+        elif parent is None:
+            self.root = None
+        else:
+            if red_black and not node.red:
+                self._fix_red_black_remove(node) #The node acts as the removed leaf.
+            parent = node.parent
+            self._replace_child(parent, node, None)
+            node.parent = None
+        self._retrace(parent)
+
+    #Returns the node containing the given value or None if it is not present.
+    def _find(self, value):
+        node = self.root
+        while node is not None:
+            if value < node.value:
+                node = node.left_child
+            elif value > node.value:
+                node = node.right_child
+            else:
+                return node
+        return None
 
     #Returns a boolean indicating whether or not
     #the specified value is present in the tree.
     def contains(self, value):
-        return self._contains(self.root, value)
-
-    #Recursive method used to count the number of elements in the tree.
-    def _count(self, node):
-        return 0 if node is None else 1 + self._count(node.left_child) + self._count(node.right_child)
+        return self._find(value) is not None
 
     #Returns the number of elements in the tree.
     def count(self):
-        return self._count(self.root)
+        return self._subtree_size(self.root)
 
-    #Recursive method used to insert the given value into the tree.
-    def _insert(self, node, value):
-        if value < node.value:
-            if node.left_child is None:
-                node.left_child = BinaryTreeNode(value)
-            else:
-                self._insert(node.left_child, value)
-        elif value > node.value:
-            if node.right_child is None:
-                node.right_child = BinaryTreeNode(value)
-            else:
-                self._insert(node.right_child, value)
-        else:
-            node.nb_occurences += 1
+    #Returns the number of values in [lo, hi[.
+    #Complexity: O(height)
+    def count_range(self, lo, hi):
+        return max(self.rank(hi) - self.rank(lo), 0)
+
+    #Returns the aggregate of every value in the tree (None if it is
+    #empty or if the tree was built without an aggregate function).
+    def get_aggregate(self):
+        return None if self.root is None else self.root.aggregate
 
     #Inserts the given value into the tree.
     def insert(self, value):
         if self.root is None:
             self.root = BinaryTreeNode(value)
-        else:
-            self._insert(self.root, value)
+            self.root.red = False
+            self._update(self.root)
+            return
+        node = self.root
+        while True:
+            if value < node.value:
+                if node.left_child is None:
+                    node.left_child = BinaryTreeNode(value, parent=node)
+                    node = node.left_child
+                    break
+                node = node.left_child
+            elif value > node.value:
+                if node.right_child is None:
+                    node.right_child = BinaryTreeNode(value, parent=node)
+                    node = node.right_child
+                    break
+                node = node.right_child
+            else:
+                node.nb_occurences += 1
+                self._retrace(node)
+                return
+        if self._balancing == BALANCING_RED_BLACK:
+            self._fix_red_black_insert(node)
+        self._retrace(node)
 
     #Inserts every element of the given array into the tree.
     def insert_array(self, array):
@@ -266,107 +590,907 @@ class LinkedBST:
 
     #Returns a boolean indicating if the tree is empty.
     def is_empty(self):
-        return root is None
+        return self.root is None
+
+    #Returns the rightmost node under the given node.
+    def _get_rightmost_node(self, node):
+        while node.right_child is not None:
+            node = node.right_child
+        return node
 
     #Returns the rightmost element under the given node.
     def _get_rightmost(self, node):
-        if node is None:
-            return None
-        return self._get_rightmost(node.right_child) if node.right_child is not None else node.value
+        return None if node is None else self._get_rightmost_node(node).value
 
     #Returns the maximum value in the tree.
     def max(self):
-        return self._get_rightmost(root)
+        return self._get_rightmost(self.root)
+
+    #Returns the leftmost node under the given node.
+    def _get_leftmost_node(self, node):
+        while node.left_child is not None:
+            node = node.left_child
+        return node
 
     #Returns the leftmost element under the given node.
     def _get_leftmost(self, node):
-        if node is None:
-            return None
-        return self._get_leftmost(node.left_child) if node.left_child is not None else node.value
-    
+        return None if node is None else self._get_leftmost_node(node).value
+
     #Returns the minimum value in the tree.
     def min(self):
-        return self._get_leftmost(root)
+        return self._get_leftmost(self.root)
+
+    #Returns the number of values in the tree smaller than the given value
+    #(the index of its first occurence in the sorted array if it is present).
+    #Complexity: O(height)
+    def rank(self, value):
+        result = 0
+        node = self.root
+        while node is not None:
+            if value < node.value:
+                node = node.left_child
+            elif value > node.value:
+                result += self._subtree_size(node.left_child) + node.nb_occurences
+                node = node.right_child
+            else:
+                return result + self._subtree_size(node.left_child)
+        return result
 
-    #Recursive method used to remove the first occurence
-    #of the specified value from the tree if is present.
-    def _remove(self, node, value):
+    #Removes the first occurence of the specified 
+    #value from the tree if it is present.
+    def remove(self, value):
+        node = self._find(value)
         if node is None:
             return
-        if value < node.value:
-            self._remove(node.left_child, value)
-        elif value > node.value:
-            self._remove(node.right_child, value)
+        if node.nb_occurences > 1:
+            node.nb_occurences -= 1
+            self._retrace(node)
         else:
-            if node.nb_occurences > 1:
-                node.nb_occurences -= 1
+            self._remove_node(node)
+
+    #Returns the k-th smallest value in the tree (the value at index k
+    #of the sorted array, Python-style indexing), raising an IndexError
+    #if k is out of range.
+    #Complexity: O(height)
+    def select(self, k):
+        size = self.count()
+        if not -size <= k < size:
+            raise IndexError('LinkedBST index out of range')
+        k %= size
+        node = self.root
+        while True:
+            left_size = self._subtree_size(node.left_child)
+            if k < left_size:
+                node = node.left_child
+            elif k < left_size + node.nb_occurences:
+                return node.value
+            else:
+                k -= left_size + node.nb_occurences
+                node = node.right_child
+
+    #Iterates over the values of the tree (duplicates included) in sorted order,
+    #restricted to [lo, hi[ (lo and hi are unbounded when None). Only the path
+    #from the root to the current node is stored, so stopping early is cheap.
+    #The tree must not be modified during the iteration.
+    #Complexity: O(height) memory
+    def iter_sorted(self, lo = None, hi = None):
+        stack = []
+        node = self.root
+        while True:
+            while node is not None:
+                if lo is not None and node.value < lo:
+                    node = node.right_child
+                else:
+                    stack.append(node)
+                    node = node.left_child
+            if not stack:
+                return
+            node = stack.pop()
+            if hi is not None and not node.value < hi:
+                return
+            for _ in range(node.nb_occurences):
+                yield node.value
+            node = node.right_child
+
+    #Iterates over the values of the tree (duplicates included) in reverse
+    #sorted order, restricted to [lo, hi[ (lo and hi are unbounded when None).
+    #Complexity: O(height) memory
+    def iter_reversed(self, lo = None, hi = None):
+        stack = []
+        node = self.root
+        while True:
+            while node is not None:
+                if hi is not None and not node.value < hi:
+                    node = node.left_child
+                else:
+                    stack.append(node)
+                    node = node.right_child
+            if not stack:
+                return
+            node = stack.pop()
+            if lo is not None and node.value < lo:
+                return
+            for _ in range(node.nb_occurences):
+                yield node.value
+            node = node.left_child
+
+    #Iterates over the values of the tree (duplicates included) in pre-order.
+    #Complexity: O(height) memory
+    def iter_preorder(self):
+        stack = [] if self.root is None else [self.root]
+        while stack:
+            node = stack.pop()
+            for _ in range(node.nb_occurences):
+                yield node.value
+            if node.right_child is not None:
+                stack.append(node.right_child)
+            if node.left_child is not None:
+                stack.append(node.left_child)
+
+    #Iterates over the values of the tree (duplicates included) in post-order.
+    #Complexity: O(height) memory
+    def iter_postorder(self):
+        stack = []
+        node = self.root
+        last = None
+        while True:
+            while node is not None:
+                stack.append(node)
+                node = node.left_child
+            if not stack:
+                return
+            top = stack[-1]
+            if top.right_child is not None and last is not top.right_child:
+                node = top.right_child
             else:
-                pass #TODO
+                last = stack.pop()
+                for _ in range(last.nb_occurences):
+                    yield last.value
 
-    #Removes the first occurence of the specified 
-    #value from the tree if it is present.
-    def remove(self, value):
-        self._remove(root, value)
+    #Iterates over the values of the tree in sorted order.
+    def __iter__(self):
+        return self.iter_sorted()
 
-    #Recursive method used to build an array where the elements'
-    #order corresponds to the post-order traversal of the tree.
-    def _get_postorder_array(self, node, array):
-        if node is None:
-            return 
-        self._get_postorder_array(node.left_child, array)
-        self._get_postorder_array(node.right_child, array)
-        array.extend([node.value] * node.nb_occurences)
+    #Iterates over the values of the tree in reverse sorted order.
+    def __reversed__(self):
+        return self.iter_reversed()
 
     #Returns an array where the elements' order
     #corresponds to the post-order traversal of the tree.
     def get_postorder_array(self):
-        array = []
-        self._get_postorder_array(self.root, array)
-        return array
-
-    #Recursive method used to build an array where the elements'
-    #order corresponds to the pre-order traversal of the tree.
-    def _get_preorder_array(self, node, array):
-        if node is None:
-            return 
-        array.extend([node.value] * node.nb_occurences)
-        self._get_preorder_array(node.left_child, array)
-        self._get_preorder_array(node.right_child, array)
+        return list(self.iter_postorder())
 
     #Returns an array where the elements' order
     #corresponds to the pre-order traversal of the tree.
     def get_preorder_array(self):
-        array = []
-        self._get_preorder_array(self.root, array)
-        return array
-
-    #Recursive method used to build a reversly sorted array from the tree.
-    def _get_reversed_array(self, node, array):
-        if node is None:
-            return 
-        self._get_reversed_array(node.right_child, array)
-        array.extend([node.value] * node.nb_occurences)
-        self._get_reversed_array(node.left_child, array)
+        return list(self.iter_preorder())
 
     #Returns a reversly sorted array containing all the elements in the tree.
     def get_reversed_array(self):
-        array = []
-        self._get_reversed_array(self.root, array)
-        return array
-
-    #Recursive method used to build a sorted array from the tree.
-    def _get_sorted_array(self, node, array):
-        if node is None:
-            return 
-        self._get_sorted_array(node.left_child, array)
-        array.extend([node.value] * node.nb_occurences)
-        self._get_sorted_array(node.right_child, array)
+        return list(self.iter_reversed())
 
     #Returns a sorted array containing all the elements in the tree.
     def get_sorted_array(self):
-        array = []
-        self._get_sorted_array(self.root, array)
-        return array
+        return list(self.iter_sorted())
+
+
+
+#-----------------------------Static search tree-------------------------------
+
+#Stores the given sorted values in the one-indexed array "tree" (of size n + 1)
+#in Eytzinger order: the order of a breadth-first traversal of the complete
+#binary search tree of the values, where the children of slot k are 2k and 2k + 1.
+#Returns the list mapping each slot to the index of its value in the sorted order.
+#Complexity: O(n)
+def _fill_eytzinger(tree, values):
+    n = len(values)
+    ranks = [0] * (n + 1)
+    rank = 0
+    stack = []
+    k = 1
+    while stack or k <= n: #In-order traversal of the implicit tree.
+        while k <= n:
+            stack.append(k)
+            k *= 2
+        k = stack.pop()
+        tree[k] = values[rank]
+        ranks[k] = rank
+        rank += 1
+        k = 2 * k + 1
+    return ranks
+
+
+#Read-only search tree built from sorted values laid out in Eytzinger order
+#in a typed array (or a list when typecode is None). The first levels of the
+#tree, visited by every search, are stored next to each other and a search
+#only moves forward in the array, which makes better use of the memory caches
+#than a binary search over the sorted values. The searches descend the whole
+#tree with an arithmetic step instead of a three-way branch and recover the
+#answer from the final index's bits.
+#Build: O(n)   Contains/Lower bound/Upper bound: O(log(n))
+class StaticSearchTree:
+    def __init__(self, values, typecode = None):
+        values = list(values)
+        self._size = len(values)
+        tree = [values[0] if values else 0] * (self._size + 1)
+        ranks = _fill_eytzinger(tree, values)
+        self._tree = array.array(typecode, tree) if typecode else tree
+        self._ranks = array.array('q', ranks)
+
+    #Returns a boolean indicating if the given value is present in the tree.
+    def __contains__(self, value):
+        return self.contains(value)
+
+    #Iterates over the values in sorted order.
+    def __iter__(self):
+        order = [0] * self._size
+        for k in range(1, self._size + 1):
+            order[self._ranks[k]] = self._tree[k]
+        return iter(order)
+
+    #Returns the number of values in the tree.
+    def __len__(self):
+        return self._size
+
+    #Returns the slot of the first value which doesn't evaluate to
+    #less than x (or greater than x if upper is True), 0 if there is none.
+    def _search(self, x, upper):
+        tree = self._tree
+        n = self._size
+        k = 1
+        if upper:
+            while k <= n:
+                k = 2 * k + (tree[k] <= x)
+        else:
+            while k <= n:
+                k = 2 * k + (tree[k] < x)
+        #The last left turn led to the answer: drop the trailing right turns (1 bits) and it.
+        return k >> (~k & (k + 1)).bit_length()
+
+    #Returns a boolean indicating if the given value is present in the tree.
+    def contains(self, x):
+        k = self._search(x, False)
+        return k != 0 and self._tree[k] == x
+
+    #Returns a boolean indicating if the tree is empty.
+    def empty(self):
+        return self._size == 0
+
+    #Returns the position (in sorted order) of the first value which
+    #doesn't evaluate to less than x (the number of values if there is none).
+    def lower_bound(self, x):
+        k = self._search(x, False)
+        return self._size if k == 0 else self._ranks[k]
+
+    #Returns the largest value in the tree or None if it is empty.
+    def max(self):
+        k = 1
+        while 2 * k + 1 <= self._size:
+            k = 2 * k + 1
+        return self._tree[k] if self._size > 0 else None
+
+    #Returns the smallest value in the tree or None if it is empty.
+    def min(self):
+        k = 1
+        while 2 * k <= self._size:
+            k *= 2
+        return self._tree[k] if self._size > 0 else None
+
+    #Returns the number of values in the tree.
+    def size(self):
+        return self._size
+
+    #Returns the position (in sorted order) of the first value which
+    #evaluates to greater than x (the number of values if there is none).
+    def upper_bound(self, x):
+        k = self._search(x, True)
+        return self._size if k == 0 else self._ranks[k]
+
+
+
+#---------------------------------B+-tree--------------------------------------
+
+#Default order (maximum number of children of a node) of an in-memory B+-tree.
+BPLUS_TREE_DEFAULT_ORDER = 64
+
+#Default size of the pages of a file-backed B+-tree (in bytes).
+BPLUS_TREE_PAGE_SIZE = 4096
+
+#Default number of pages kept in memory by a file page store.
+BPLUS_TREE_CACHE_PAGES = 1024
+
+#Identifier of the missing pages (no next leaf, empty free list).
+NO_PAGE = -1
+
+
+#Class used to represent a node (page) of a B+-tree. Leaves store the values
+#of their keys and the identifier of the next leaf; internal nodes store the
+#identifiers of their children (one more than their keys, the keys of child i
+#being smaller than keys[i] and the ones of child i + 1 greater or equal).
+class BPlusTreeNode:
+    __slots__ = ('page_id', 'leaf', 'keys', 'values', 'children', 'next_leaf', '__weakref__')
+
+    def __init__(self, page_id, leaf):
+        self.page_id = page_id
+        self.leaf = leaf
+        self.keys = []
+        self.values = [] if leaf else None
+        self.children = None if leaf else []
+        self.next_leaf = NO_PAGE
+
+
+#Page store keeping the nodes of a B+-tree in memory. Every page store
+#allocates, reads, writes and frees nodes by page identifier and keeps the
+#tree's root, order and size.
+class MemoryPageStore:
+    def __init__(self):
+        self._pages = {}
+        self._next_id = 0
+        self.root = NO_PAGE
+        self.order = None
+        self.size = 0
+
+    #Checks that the given key and value can be stored (always in memory).
+    def check(self, key, value):
+        pass
+
+    #Returns the largest order whose nodes fit in a page (None if unbounded).
+    def max_order(self):
+        return None
+
+    #Returns a new node with a free page identifier.
+    def allocate(self, leaf):
+        node = BPlusTreeNode(self._next_id, leaf)
+        self._pages[node.page_id] = node
+        self._next_id += 1
+        return node
+
+    #Returns the node of the given page.
+    def read(self, page_id):
+        return self._pages[page_id]
+
+    #Saves the given (modified) node.
+    def write(self, node):
+        self._pages[node.page_id] = node
+
+    #Frees the page of the given node.
+    def free(self, node):
+        del self._pages[node.page_id]
+
+    #Saves the pending changes (nothing to do in memory).
+    def flush(self):
+        pass
+
+    #Releases the store.
+    def close(self):
+        pass
+
+
+#Page store keeping the nodes of a B+-tree in fixed-size pages of a file
+#accessed through mmap. The keys and values are packed with the given struct
+#formats (e.g. 'q' for 64-bit integers, '16s' for 16-byte strings), which
+#determine how many fit in a page. Keys and values which would not be read
+#back unchanged (out of range, or strings not exactly as long as their
+#format) are rejected with a ValueError when they are inserted. The most
+#recently used pages are kept decoded in an LRU cache of "cache_pages" pages,
+#written back to the file when they are evicted or flushed. Evicted nodes
+#still held by the operation in progress are returned as is when read again
+#(instead of a stale copy), so an operation may use more nodes than the cache
+#holds. Page 0 holds the tree's header and freed pages are linked in a free
+#list to be reused. An existing file is reopened with the parameters stored
+#in its header.
+class FilePageStore:
+    MAGIC = b'SNEKBPT1'
+    HEADER = struct.Struct('<8sIIqqqq8s8s') #Magic, page size, order, root, page count, free list, size, formats.
+    PAGE_HEADER = struct.Struct('<BHq') #Kind, number of keys, next leaf (or next free page).
+    LEAF = 0
+    INTERNAL = 1
+    FREE = 2
+
+    def __init__(self, path, page_size = BPLUS_TREE_PAGE_SIZE, key_format = 'q', value_format = 'q',
+                 cache_pages = BPLUS_TREE_CACHE_PAGES):
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        self._cache = collections.OrderedDict()
+        self._dirty = set()
+        self._cache_pages = max(cache_pages, 1)
+        self._held = weakref.WeakValueDictionary() #Evicted nodes still referenced.
+        try:
+            if exists:
+                header = self._file.read(self.HEADER.size)
+                if len(header) < self.HEADER.size or not header.startswith(self.MAGIC):
+                    raise ValueError('Not a B+-tree file: ' + path)
+                _, page_size, order, root, page_count, free_head, size, key_format, value_format = self.HEADER.unpack(header)
+                key_format = key_format.rstrip(b'\0').decode()
+                value_format = value_format.rstrip(b'\0').decode()
+            else:
+                order, root, page_count, free_head, size = 0, NO_PAGE, 1, NO_PAGE, 0
+            self._key_size = struct.calcsize('<' + key_format)
+            self._value_size = struct.calcsize('<' + value_format)
+            if not exists:
+                self._file.truncate(page_size * 16)
+            self._mmap = mmap.mmap(self._file.fileno(), 0)
+        except BaseException:
+            self._file.close()
+            raise
+        self.page_size = page_size
+        self.key_format = key_format
+        self.value_format = value_format
+        self.order = order or None
+        self.root = root
+        self.size = size
+        self._page_count = page_count
+        self._free_head = free_head
+
+    #Raises a ValueError if the given field would not be read back
+    #unchanged with the given format (out of range, padded or truncated).
+    @staticmethod
+    def _check_field(fmt, field, name):
+        try:
+            stored = struct.unpack('<' + fmt, struct.pack('<' + fmt, field))[0]
+        except struct.error as e:
+            raise ValueError('Invalid ' + name + ' for format ' + repr(fmt) + ': ' + repr(field)) from e
+        if stored != field and field == field: #NaN never equals itself.
+            raise ValueError('Invalid ' + name + ' for format ' + repr(fmt) + ': ' + repr(field))
+
+    #Checks that the given key and value can be stored in a page, as they are
+    #only packed when their page is written back to the file.
+    def check(self, key, value):
+        self._check_field(self.key_format, key, 'key')
+        self._check_field(self.value_format, value, 'value')
+
+    #Returns the largest order whose nodes fit in a page.
+    def max_order(self):
+        room = self.page_size - self.PAGE_HEADER.size
+        leaf_order = room // (self._key_size + self._value_size) + 1
+        internal_order = (room + self._key_size) // (self._key_size + 8)
+        return min(leaf_order, internal_order)
+
+    #Makes sure the file has room for the given number of pages (grows by doubling).
+    def _reserve(self, page_count):
+        size = len(self._mmap)
+        if page_count * self.page_size > size:
+            size = max(page_count * self.page_size, 2 * size)
+            self._mmap.close()
+            self._file.truncate(size)
+            self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+    #Writes the given node in its page of the file.
+    def _encode(self, node):
+        offset = node.page_id * self.page_size
+        count = len(node.keys)
+        if node.leaf:
+            self.PAGE_HEADER.pack_into(self._mmap, offset, self.LEAF, count, node.next_leaf)
+            struct.pack_into('<' + self.key_format * count + self.value_format * count,
+                             self._mmap, offset + self.PAGE_HEADER.size, *node.keys, *node.values)
+        else:
+            self.PAGE_HEADER.pack_into(self._mmap, offset, self.INTERNAL, count, NO_PAGE)
+            struct.pack_into('<' + self.key_format * count + 'q' * (count + 1),
+                             self._mmap, offset + self.PAGE_HEADER.size, *node.keys, *node.children)
+
+    #Reads the node stored in the given page of the file.
+    def _decode(self, page_id):
+        offset = page_id * self.page_size
+        kind, count, next_leaf = self.PAGE_HEADER.unpack_from(self._mmap, offset)
+        node = BPlusTreeNode(page_id, kind == self.LEAF)
+        if node.leaf:
+            fields = struct.unpack_from('<' + self.key_format * count + self.value_format * count,
+                                        self._mmap, offset + self.PAGE_HEADER.size)
+            node.keys = list(fields[:count])
+            node.values = list(fields[count:])
+            node.next_leaf = next_leaf
+        else:
+            fields = struct.unpack_from('<' + self.key_format * count + 'q' * (count + 1),
+                                        self._mmap, offset + self.PAGE_HEADER.size)
+            node.keys = list(fields[:count])
+            node.children = list(fields[count:])
+        return node
+
+    #Adds the node to the page cache, writing back the least recently used
+    #pages if the cache is full.
+    def _cache_node(self, node):
+        self._cache[node.page_id] = node
+        self._cache.move_to_end(node.page_id)
+        while len(self._cache) > self._cache_pages:
+            page_id, evicted = self._cache.popitem(last=False)
+            self._held[page_id] = evicted
+            if page_id in self._dirty:
+                self._encode(evicted)
+                self._dirty.discard(page_id)
+
+    #Returns a new node with a free page identifier (reusing freed pages first).
+    def allocate(self, leaf):
+        if self._free_head != NO_PAGE:
+            page_id = self._free_head
+            _, _, self._free_head = self.PAGE_HEADER.unpack_from(self._mmap, page_id * self.page_size)
+        else:
+            page_id = self._page_count
+            self._page_count += 1
+            self._reserve(self._page_count)
+        node = BPlusTreeNode(page_id, leaf)
+        self.write(node)
+        return node
+
+    #Returns the node of the given page.
+    def read(self, page_id):
+        node = self._cache.get(page_id)
+        if node is None:
+            node = self._held.get(page_id)
+            if node is None:
+                node = self._decode(page_id)
+            self._cache_node(node)
+        else:
+            self._cache.move_to_end(page_id)
+        return node
+
+    #Saves the given (modified) node (written to the file once evicted or flushed).
+    def write(self, node):
+        self._dirty.add(node.page_id)
+        self._cache_node(node)
+
+    #Frees the page of the given node, adding it to the free list.
+    def free(self, node):
+        self._cache.pop(node.page_id, None)
+        self._held.pop(node.page_id, None)
+        self._dirty.discard(node.page_id)
+        self.PAGE_HEADER.pack_into(self._mmap, node.page_id * self.page_size, self.FREE, 0, self._free_head)
+        self._free_head = node.page_id
+
+    #Writes the modified pages and the header to the file.
+    def flush(self):
+        for page_id in self._dirty:
+            self._encode(self._cache[page_id])
+        self._dirty.clear()
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self.page_size, self.order or 0, self.root,
+                              self._page_count, self._free_head, self.size,
+                              self.key_format.encode(), self.value_format.encode())
+        self._mmap.flush()
+
+    #Flushes the store and closes the file.
+    def close(self):
+        if not self._mmap.closed:
+            try:
+                self.flush()
+            finally:
+                self._mmap.close()
+                self._file.close()
+
+
+#B+-tree mapping unique keys to values, stored in the pages of the given
+#page store (in memory by default, or a FilePageStore to keep an index larger
+#than the memory on disk). The order is the maximum number of children of a
+#node (the largest order fitting in a page by default for a file). The values
+#are stored in the leaves, which are linked in order for the range scans.
+#Insert: O(log n)   Remove: O(log n)   Search: O(log n)   Range scan: O(log n + k)
+class BPlusTree:
+    def __init__(self, order = None, store = None):
+        self._store = MemoryPageStore() if store is None else store
+        max_order = self._store.max_order()
+        if self._store.order is not None: #Reopened store.
+            order = self._store.order
+        elif order is None:
+            order = BPLUS_TREE_DEFAULT_ORDER if max_order is None else max_order
+        if order < 3 or (max_order is not None and order > max_order):
+            raise ValueError('Invalid B+-tree order: ' + str(order))
+        self._store.order = order
+        self._max_keys = order - 1
+        self._min_keys = (order + 1) // 2 - 1
+        if self._store.root == NO_PAGE:
+            self._store.root = self._store.allocate(True).page_id
+
+    #Returns a boolean indicating if the given key is in the tree.
+    def __contains__(self, key):
+        return self.contains(key)
+
+    #Removes the given key, raising a KeyError if it isn't in the tree.
+    def __delitem__(self, key):
+        if not self.remove(key):
+            raise KeyError(key)
+
+    #Flushes and closes the page store when used in a with statement.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #Returns the value of the given key, raising a KeyError if it isn't in the tree.
+    def __getitem__(self, key):
+        leaf = self._find_leaf(key)
+        i = bisect.bisect_left(leaf.keys, key)
+        if i == len(leaf.keys) or leaf.keys[i] != key:
+            raise KeyError(key)
+        return leaf.values[i]
+
+    #Iterates over the keys of the tree in order.
+    def __iter__(self):
+        for key, _ in self.range():
+            yield key
+
+    #Returns the number of keys in the tree.
+    def __len__(self):
+        return self._store.size
+
+    #Sets the value of the given key.
+    def __setitem__(self, key, value):
+        self.insert(key, value)
+
+    #Returns the leaf which should contain the given key.
+    def _find_leaf(self, key):
+        node = self._store.read(self._store.root)
+        while not node.leaf:
+            node = self._store.read(node.children[bisect.bisect_right(node.keys, key)])
+        return node
+
+    #Returns the path from the root to the leaf which should contain
+    #the given key as a list of (node, index of the child taken).
+    def _find_path(self, key):
+        path = []
+        node = self._store.read(self._store.root)
+        while not node.leaf:
+            i = bisect.bisect_right(node.keys, key)
+            path.append((node, i))
+            node = self._store.read(node.children[i])
+        return path, node
+
+    #Splits the given overflowing node in two and returns the
+    #key separating them and the new (right) node.
+    def _split(self, node):
+        right = self._store.allocate(node.leaf)
+        middle = len(node.keys) // 2
+        if node.leaf:
+            right.keys = node.keys[middle:]
+            right.values = node.values[middle:]
+            del node.keys[middle:]
+            del node.values[middle:]
+            right.next_leaf = node.next_leaf
+            node.next_leaf = right.page_id
+            separator = right.keys[0]
+        else:
+            separator = node.keys[middle]
+            right.keys = node.keys[middle + 1:]
+            right.children = node.children[middle + 1:]
+            del node.keys[middle:]
+            del node.children[middle + 1:]
+        self._store.write(node)
+        self._store.write(right)
+        return separator, right
+
+    #Fixes the given underflowing node, which is the child at the given index
+    #of the given parent, by borrowing a key from a sibling or merging with it.
+    #Returns a boolean indicating if the parent lost a key (after a merge).
+    def _rebalance(self, parent, index, node):
+        store = self._store
+        left = store.read(parent.children[index - 1]) if index > 0 else None
+        right = store.read(parent.children[index + 1]) if index + 1 < len(parent.children) else None
+        if left is not None and len(left.keys) > self._min_keys:
+            if node.leaf:
+                node.keys.insert(0, left.keys.pop())
+                node.values.insert(0, left.values.pop())
+                parent.keys[index - 1] = node.keys[0]
+            else:
+                node.keys.insert(0, parent.keys[index - 1])
+                node.children.insert(0, left.children.pop())
+                parent.keys[index - 1] = left.keys.pop()
+            store.write(left)
+        elif right is not None and len(right.keys) > self._min_keys:
+            if node.leaf:
+                node.keys.append(right.keys.pop(0))
+                node.values.append(right.values.pop(0))
+                parent.keys[index] = right.keys[0]
+            else:
+                node.keys.append(parent.keys[index])
+                node.children.append(right.children.pop(0))
+                parent.keys[index] = right.keys.pop(0)
+            store.write(right)
+        else:
+            if left is not None: #Merge the node into its left sibling.
+                index -= 1
+                node, right = left, node
+            if node.leaf:
+                node.keys.extend(right.keys)
+                node.values.extend(right.values)
+                node.next_leaf = right.next_leaf
+            else:
+                node.keys.append(parent.keys[index])
+                node.keys.extend(right.keys)
+                node.children.extend(right.children)
+            del parent.keys[index]
+            del parent.children[index + 1]
+            store.free(right)
+            store.write(node)
+            store.write(parent)
+            return True
+        store.write(node)
+        store.write(parent)
+        return False
+
+    #Closes the page store (flushing it to its file).
+    def close(self):
+        self._store.close()
+
+    #Returns a boolean indicating if the given key is in the tree.
+    def contains(self, key):
+        leaf = self._find_leaf(key)
+        i = bisect.bisect_left(leaf.keys, key)
+        return i < len(leaf.keys) and leaf.keys[i] == key
+
+    #Returns a boolean indicating if the tree is empty.
+    def empty(self):
+        return self._store.size == 0
+
+    #Writes the pending changes to the page store's file.
+    def flush(self):
+        self._store.flush()
+
+    #Returns the value of the given key or the given
+    #default value (None by default) if it isn't in the tree.
+    def get(self, key, default = None):
+        leaf = self._find_leaf(key)
+        i = bisect.bisect_left(leaf.keys, key)
+        return leaf.values[i] if i < len(leaf.keys) and leaf.keys[i] == key else default
+
+    #Inserts the given key with the given value (replacing the value if the key is already present).
+    def insert(self, key, value):
+        store = self._store
+        store.check(key, value)
+        path, leaf = self._find_path(key)
+        i = bisect.bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            leaf.values[i] = value
+            store.write(leaf)
+            return
+        leaf.keys.insert(i, key)
+        leaf.values.insert(i, value)
+        store.size += 1
+        node = leaf
+        while len(node.keys) > self._max_keys:
+            separator, right = self._split(node)
+            if not path: #The root was split: the tree grows by one level.
+                root = store.allocate(False)
+                root.keys = [separator]
+                root.children = [node.page_id, right.page_id]
+                store.write(root)
+                store.root = root.page_id
+                return
+            node, i = path.pop()
+            node.keys.insert(i, separator)
+            node.children.insert(i + 1, right.page_id)
+        store.write(node)
+
+    #Returns the largest key in the tree or None if it is empty.
+    def max(self):
+        node = self._store.read(self._store.root)
+        while not node.leaf:
+            node = self._store.read(node.children[-1])
+        return node.keys[-1] if node.keys else None
+
+    #Returns the smallest key in the tree or None if it is empty.
+    def min(self):
+        node = self._store.read(self._store.root)
+        while not node.leaf:
+            node = self._store.read(node.children[0])
+        return node.keys[0] if node.keys else None
+
+    #Iterates over the (key, value) pairs whose key is in [lo, hi[ in order
+    #(lo and hi are unbounded when None) by following the links between the
+    #leaves. The tree must not be modified during the iteration.
+    def range(self, lo = None, hi = None):
+        if lo is None:
+            leaf = self._store.read(self._store.root)
+            while not leaf.leaf:
+                leaf = self._store.read(leaf.children[0])
+            i = 0
+        else:
+            leaf = self._find_leaf(lo)
+            i = bisect.bisect_left(leaf.keys, lo)
+        while True:
+            keys = leaf.keys
+            values = leaf.values
+            while i < len(keys):
+                if hi is not None and not keys[i] < hi:
+                    return
+                yield keys[i], values[i]
+                i += 1
+            if leaf.next_leaf == NO_PAGE:
+                return
+            leaf = self._store.read(leaf.next_leaf)
+            i = 0
+
+    #Removes the given key from the tree. Returns
+    #a boolean indicating if the key was present.
+    def remove(self, key):
+        store = self._store
+        path, leaf = self._find_path(key)
+        i = bisect.bisect_left(leaf.keys, key)
+        if i == len(leaf.keys) or leaf.keys[i] != key:
+            return False
+        del leaf.keys[i]
+        del leaf.values[i]
+        store.size -= 1
+        store.write(leaf)
+        node = leaf
+        while path and len(node.keys) < self._min_keys:
+            parent, index = path.pop()
+            if not self._rebalance(parent, index, node):
+                break
+            node = parent
+        root = store.read(store.root)
+        if not root.leaf and not root.keys: #The tree shrinks by one level.
+            store.root = root.children[0]
+            store.free(root)
+        return True
+
+    #Returns the number of keys in the tree.
+    def size(self):
+        return self._store.size
+
+    #Builds a tree from (key, value) pairs sorted by key in O(n), filling the
+    #leaves (and then each level of internal nodes) from left to right up to
+    #the given fraction of their capacity without searching for insertion
+    #points. The input is consumed as a stream: only one leaf and the
+    #(first key, page) entries of the level above are kept in memory. When a
+    #key is repeated, the last value is kept. The store must be empty.
+    @classmethod
+    def from_sorted(cls, items, order = None, store = None, fill_factor = 1.0):
+        tree = cls(order, store)
+        store = tree._store
+        store.free(store.read(store.root))
+        per_node = max(int(tree._max_keys * fill_factor), tree._min_keys, 1)
+        entries = [] #(first key, page) of each node of the level being built.
+        pending = None #Last leaf built, written once the next one is allocated.
+        keys = []
+        values = []
+
+        #Builds a leaf from the given keys and values and links it after the previous one.
+        def emit_leaf(leaf_keys, leaf_values):
+            nonlocal pending
+            leaf = store.allocate(True)
+            leaf.keys = leaf_keys
+            leaf.values = leaf_values
+            if pending is not None:
+                pending.next_leaf = leaf.page_id
+                store.write(pending)
+            pending = leaf
+            entries.append((leaf_keys[0] if leaf_keys else None, leaf.page_id))
+
+        for key, value in items:
+            store.check(key, value)
+            if keys and keys[-1] == key:
+                values[-1] = value
+                continue
+            keys.append(key)
+            values.append(value)
+            store.size += 1
+            if len(keys) == per_node + tree._min_keys + 1: #Keep enough keys for a valid last leaf.
+                emit_leaf(keys[:per_node], values[:per_node])
+                del keys[:per_node]
+                del values[:per_node]
+        if len(keys) > tree._max_keys:
+            middle = len(keys) // 2
+            emit_leaf(keys[:middle], values[:middle])
+            del keys[:middle]
+            del values[:middle]
+        if keys or not entries:
+            emit_leaf(keys, values)
+        store.write(pending)
+
+        per_node = max(per_node + 1, tree._min_keys + 1) #Children per internal node.
+        while len(entries) > 1:
+            groups = [entries[i:i + per_node] for i in range(0, len(entries), per_node)]
+            if len(groups) > 1 and len(groups[-1]) < tree._min_keys + 1: #Share with the previous node.
+                merged = groups[-2] + groups[-1]
+                middle = len(merged) // 2
+                groups[-2:] = [merged] if len(merged) <= tree._max_keys + 1 else [merged[:middle], merged[middle:]]
+            entries = []
+            for group in groups:
+                node = store.allocate(False)
+                node.keys = [first_key for first_key, _ in group[1:]]
+                node.children = [page_id for _, page_id in group]
+                store.write(node)
+                entries.append((group[0][0], node.page_id))
+        store.root = entries[0][1]
+        return tree
 
 
 